@@ -6,16 +6,28 @@
 
 import streamlit as st
 import pandas as pd
-import csv
-import re
 import io
 import os
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-import plotly.express as px
 from math import ceil
-from datetime import datetime, date
+
+from prisma.cache import ParseCache
+from prisma.depara import depara_signature
+from prisma.parser import (
+    br_format_array,
+    periodo_label_text,
+)
+from prisma.pipeline import (
+    TREND_MEASURES,
+    consolidate,
+    latest_label,
+    scan_file,
+    select_files,
+    setor_column,
+    summary_table,
+    trend_matrix,
+    trend_table,
+    volume_by_setor,
+)
 
 st.set_page_config(page_title="PROTOCOLO PRISMA VER. 0.7.6", layout="wide")
 st.title("🧾 PROTOCOLO PRISMA VER. 0.7.6")
@@ -32,376 +44,196 @@ st.markdown(
     "**IMPORTANTE: A VOLUMETRIA APURADA REMETE AOS PACIENTES COM CONSUMO NO MÊS EM QUESTÃO E NÃO NA DATA DE ENTRADA / ATENDIMENTO.**"
 )
 
-# ----------------------- Funções auxiliares -----------------------
-
-
-def parse_number_us(s):
-    if s is None:
-        return None
-    s = str(s).strip().strip('"')
-    if s == "":
-        return None
-    s = s.replace(",", "")
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-def br_format(n):
-    if n is None or n == "":
-        return ""
-    s = f"{n:,.2f}"
-    return s.replace(",", "X").replace(".", ",").replace("X", ".")
-
+# ----------------------- Interface -----------------------
 
-def extract_between(text, start_label, end_label):
-    p = text.find(start_label)
-    if p == -1:
-        return ""
-    p += len(start_label)
-    q = text.find(end_label, p)
-    return text[p:q].strip() if q != -1 else text[p:].strip()
 
+try:
+    st.image("image001 (1).png", use_container_width=False, width=1000)
+except TypeError:
+    st.image("image001 (1).png", use_column_width=False, width=1000)
 
-def extract_plano(text):
-    m = re.search(r'Plano\s*:\s*"?([^"]*?)"?$', text.strip())
-    if m and m.group(1):
-        return m.group(1).strip()
-    if "Plano:" in text:
-        return text.split("Plano:")[-1].strip().strip('"')
-    return ""
+st.markdown("### 1️⃣ Envie os arquivos .txt para processar (seleção múltipla)")
 
+uploaded_files = st.file_uploader(
+    "Selecionar arquivos",
+    type=["txt"],
+    accept_multiple_files=True
+)
 
-def detect_periodo_first_lines(raw_text: str) -> str:
-    lines = raw_text.splitlines()[:5]
-    header = " ".join(lines)
+# Processamento paralelo (opcional) — um processo por arquivo
+col_par, col_workers, col_compacto = st.columns([1, 1, 1])
 
-    m = re.search(
-        r'[",]*Per[ií]odo\s*:[" ,]*([0-3]?\d/[0-1]?\d/\d{4})\s*a\s*([0-3]?\d/[0-1]?\d/\d{4})',
-        header
+with col_par:
+    parse_paralelo = st.checkbox(
+        "Processar arquivos em paralelo",
+        value=False,
+        help="Distribui os arquivos (ou, com um único arquivo, os seus setores) entre vários núcleos da máquina."
     )
 
-    return f"{m.group(1)} a {m.group(2)}" if m else ""
-
-
-# ============================================================
-# ALTERAÇÃO 1 — Período Label agora retorna DATA
-# ============================================================
-
-def periodo_label_br(periodo_str: str):
-    """
-    Converte 'dd/mm/yyyy a dd/mm/yyyy'
-    para data do primeiro dia do mês (01/mm/aa)
-    """
-
-    if not isinstance(periodo_str, str) or "a" not in periodo_str:
-        return None
-
-    inicio = periodo_str.split("a")[0].strip()
-
-    try:
-
-        d = pd.to_datetime(inicio, format="%d/%m/%Y", errors="coerce")
+with col_workers:
+    parse_workers = st.number_input(
+        "Núcleos",
+        min_value=2,
+        max_value=max(2, os.cpu_count() or 2),
+        value=min(4, max(2, os.cpu_count() or 2)),
+        disabled=not parse_paralelo
+    )
 
-        if pd.isna(d):
-            return None
+with col_compacto:
+    esquema_compacto = st.checkbox(
+        "Esquema compacto (menos memória)",
+        value=False,
+        help="Textos repetidos como categorias, valores em float32 quando não há perda "
+             "de centavos e Entrada/Alta como datas."
+    )
 
-        return datetime(d.year, d.month, 1)
+# Caminho da memória histórica (uma partição Parquet por mês)
+HIST_PATH = os.path.join(os.getcwd(), "prisma_historico")
 
-    except Exception:
-        return None
+# Formato antigo (arquivo único) — convertido na primeira execução com arquivos enviados
+HIST_LEGACY_PATH = os.path.join(os.getcwd(), "prisma_historico.parquet")
 
+# Cache de leitura por conteúdo (memória + Parquet em disco)
+PARSE_CACHE_DIR = os.path.join(os.getcwd(), "prisma_cache")
 
-def parse_periodo_to_dates(periodo_str: str):
 
-    if not isinstance(periodo_str, str) or 'a' not in periodo_str:
-        return (None, None)
+@st.cache_resource
+def get_parse_cache():
+    return ParseCache(cache_dir=PARSE_CACHE_DIR)
 
-    partes = periodo_str.split('a')
+# Planilha DE PARA SETOR (Setor → Setor Agrupado)
+DEPARA_PATH = os.path.join(os.getcwd(), "DE PARA SETOR.xlsx")
 
-    if len(partes) != 2:
-        return (None, None)
 
-    ini = partes[0].strip()
-    fim = partes[1].strip()
-
-    try:
+# ------------------- Etapas guardadas na sessão -------------------
 
-        dt_ini = datetime.strptime(ini, "%d/%m/%Y").date()
-        dt_fim = datetime.strptime(fim, "%d/%m/%Y").date()
+def etapa(nome, chave, calcular):
+    """
+    Resultado de uma etapa do processamento guardado na sessão:
+    calcular() só roda de novo quando a chave (entradas da etapa) muda.
+    Um clique em qualquer widget não refaz as etapas anteriores a ele.
+    """
 
-        return (dt_ini, dt_fim)
+    guardado = st.session_state.get(f"etapa_{nome}")
 
-    except Exception:
-        return (None, None)
+    if guardado is not None and guardado[0] == chave:
+        return guardado[1]
 
+    valor = calcular()
 
-def periodo_key(lbl):
+    st.session_state[f"etapa_{nome}"] = (chave, valor)
 
-    if pd.isna(lbl):
-        return (9999, 99)
+    return valor
 
-    try:
 
-        d = pd.to_datetime(lbl)
+def chave_arquivo(f):
+    # file_id muda a cada novo envio do arquivo
+    return (
+        getattr(f, "name", ""),
+        getattr(f, "file_id", None) or id(f),
+        getattr(f, "size", None),
+    )
 
-        return (d.year, d.month)
 
-    except Exception:
-        return (9999, 99)
+def consolidar_upload(kept_infos, workers, compactar):
+    """
+    consolidate (o mesmo da CLI e do modo contínuo) com o ParseCache e o DE PARA do app,
+    mais os tempos de leitura e a memória antes/depois do esquema compacto.
+    """
 
+    memoria = []
 
-def fmt_de_ate(dt_ini: date, dt_fim: date) -> str:
+    df = consolidate(
+        kept_infos,
+        depara_path=DEPARA_PATH,
+        workers=workers,
+        cache=get_parse_cache(),
+        compact=compactar,
+        memoria=memoria
+    )
 
-    if dt_ini is None or dt_fim is None:
-        return ""
+    tempos = [
+        {k: r.get(k) for k in ("cache_key", "tempo_parse", "registros", "cache")}
+        for r in kept_infos
+    ]
 
-    return f"de {dt_ini.strftime('%d/%m/%Y')} a {dt_fim.strftime('%d/%m/%Y')}"
-# ----------------------- Núcleo de processamento -----------------------
+    return df, tempos, memoria[0] if memoria else None, latest_label(df)
 
 
-def process_txt_content(txt: str, origem_nome: str = "", upload_seq: int = 0) -> pd.DataFrame:
+def grafico_setores_png(agrupamento) -> bytes:
     """
-    Processa o conteúdo de um .txt (Sishop) e retorna o DataFrame com linhas por (Paciente x Tipo de Produto).
+    Gráfico de barras por setor, renderizado uma vez como PNG.
     """
 
-    raw = txt.replace(",Setor:,", ",")
-    lines_all = raw.splitlines()
-
-    default_periodo = detect_periodo_first_lines(raw)
+    # matplotlib só é importado quando o gráfico é desenhado
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
 
-    current_setor = ""
-    current_periodo = default_periodo
-
-    records = []
-
-    i = 0
-
-    m_data = re.search(r"Data:\s*,?\s*([0-3]?\d/[0-1]?\d/\d{4})", txt)
-    data_extracao = m_data.group(1) if m_data else "DATA_NAO_ENCONTRADA"
+    cmap = plt.cm.get_cmap("tab20", len(agrupamento))
+    cores = [cmap(i) for i in range(len(agrupamento))]
 
-    while i < len(lines_all):
+    fig, ax = plt.subplots(figsize=(8, 3))
 
-        line = lines_all[i]
+    bars = ax.bar(
+        agrupamento.index,
+        agrupamento.values,
+        color=cores
+    )
 
-        if ("AMERICAS MEDICAL CITY" in line) or ("ALCLIMA" in line):
-            i += 1
-            continue
+    for bar, cor in zip(bars, cores):
 
-        if "Período" in line or "Período" in ",".join(lines_all[max(0, i-2):i+5]):
+        bar.set_zorder(2)
 
-            window = ",".join(lines_all[max(0, i-2):min(len(lines_all), i+5)])
+        ax.add_patch(
 
-            m = re.search(
-                r'[",]*Per[ií]odo\s*:[" ,]*([0-3]?\d/[0-1]?\d/\d{4})\s*a\s*([0-3]?\d/[0-1]?\d/\d{4})',
-                window
+            Rectangle(
+                (bar.get_x(), 0),
+                bar.get_width(),
+                bar.get_height(),
+                facecolor=cor,
+                alpha=0.15,
+                zorder=1
             )
 
-            if m:
-                current_periodo = f"{m.group(1)} a {m.group(2)}"
-            else:
-                current_periodo = default_periodo
-
-        if line.startswith("Setor:"):
-
-            parts = next(csv.reader([line]))
-
-            if len(parts) >= 2:
-                current_setor = parts[1].strip().strip('"')
-
-        if line.startswith("Paciente:"):
-
-            fields = next(csv.reader([line]))
-
-            payload = fields[1].strip().strip('"') if len(fields) >= 2 else ""
-
-            split_marker = "  Entrada: "
-
-            p_ent = payload.find(split_marker)
-
-            id_nome = payload[:p_ent].strip() if p_ent != - \
-                1 else payload.strip()
-
-            entrada = extract_between(payload, "  Entrada: ", "  Alta: ")
-            alta = extract_between(payload, "  Alta: ", "  Convênio: ")
-            convenio = extract_between(payload, "  Convênio: ", "  Plano: ")
-            plano = extract_plano(payload)
-
-            j = i + 1
-
-            while j < len(lines_all):
-
-                l2 = lines_all[j]
-
-                if l2.startswith("Paciente:") or l2.startswith("Setor:"):
-                    break
-
-                if ("AMERICAS MEDICAL CITY" in l2) or ("ALCLIMA" in l2):
-                    j += 1
-                    continue
-
-                if l2.startswith('"Tipo de Produto:"'):
-
-                    prod_fields = next(csv.reader([l2]))
-
-                    tipo_produto = prod_fields[1].strip().strip(
-                        '"') if len(prod_fields) > 1 else ""
-
-                    k = j + 1
-
-                    while k < len(lines_all):
-
-                        l3 = lines_all[k]
-
-                        if ("AMERICAS MEDICAL CITY" in l3) or ("ALCLIMA" in l3):
-                            k += 1
-                            continue
-
-                        if "Total do Tipo de Produto:" in l3:
-
-                            tot_fields = next(csv.reader([l3]))
-
-                            qtd_total = parse_number_us(tot_fields[1]) if len(
-                                tot_fields) > 1 else None
-                            custo_atual = parse_number_us(
-                                tot_fields[2]) if len(tot_fields) > 2 else None
-                            consumo_total = parse_number_us(
-                                tot_fields[3]) if len(tot_fields) > 3 else None
-
-                            periodo_final = current_periodo or default_periodo
-
-                            records.append({
-
-                                "Arquivo Origem": origem_nome,
-                                "Upload Seq": upload_seq,
-                                "Extração Sishop": data_extracao,
-
-                                "Período": periodo_final,
-
-                                "Período Label": periodo_label_br(periodo_final),
-
-                                "Setor": current_setor,
-
-                                "Paciente": id_nome,
-
-                                "Entrada": entrada,
-                                "Alta": alta,
-                                "Convênio": convenio,
-                                "Plano": plano,
-
-                                "Tipo de Produto": tipo_produto,
-
-                                "Qtd. Total": qtd_total,
-                                "Custo Atual": custo_atual,
-                                "Consumo Total": consumo_total
-
-                            })
-
-                            j = k
-                            break
-
-                        if l3.startswith('"Tipo de Produto:"') or l3.startswith("Paciente:") or l3.startswith("Setor:"):
-                            break
-
-                        k += 1
-
-                j += 1
-
-            i = j - 1
-
-        i += 1
-
-    df = pd.DataFrame(records, columns=[
-
-        "Arquivo Origem",
-        "Upload Seq",
-        "Extração Sishop",
-
-        "Período",
-        "Período Label",
-
-        "Setor",
-
-        "Paciente",
-
-        "Entrada",
-        "Alta",
-        "Convênio",
-        "Plano",
-
-        "Tipo de Produto",
-
-        "Qtd. Total",
-        "Custo Atual",
-        "Consumo Total"
-
-    ])
-
-    # ============================================================
-    # ALTERAÇÃO 2 — SPLIT DA COLUNA PACIENTE
-    # ============================================================
-
-    if not df.empty and "Paciente" in df.columns:
-
-        split_cols = df["Paciente"].str.split(" - ", n=1, expand=True)
-
-        df["Registro"] = split_cols[0]
-        df["Nome do Paciente"] = split_cols[1]
-
-        df.drop(columns=["Paciente"], inplace=True)
-
-        # reorganizar posição das colunas (mantendo lógica do arquivo)
-        cols = df.columns.tolist()
-
-        pos = cols.index("Registro")
-
-        cols.insert(pos + 1, cols.pop(cols.index("Nome do Paciente")))
-
-        df = df[cols]
-
-    return df
+        )
 
+    ax.set_title(
+        "Volume de Atendimento por Setor Agrupado",
+        fontsize=7,
+        fontweight="bold"
+    )
 
-def process_multiple_texts(file_infos) -> pd.DataFrame:
-    """
-    Recebe lista de dicts {'name','text','upload_seq'} já filtrada (sem meses duplicados).
-    """
+    ax.set_yticks([])
 
-    frames = []
+    plt.xticks(rotation=45, ha="right", fontsize=6)
 
-    for info in file_infos:
+    for i, v in enumerate(agrupamento):
 
-        frames.append(
-            process_txt_content(
-                info["text"],
-                origem_nome=info["name"],
-                upload_seq=info["upload_seq"]
-            )
+        ax.text(
+            i,
+            v,
+            f"{int(v):,}".replace(",", "."),
+            ha="center",
+            va="bottom",
+            fontsize=7,
+            fontweight="bold"
         )
 
-    if not frames:
-        return pd.DataFrame()
-
-    return pd.concat(frames, ignore_index=True)
-# ----------------------- Interface -----------------------
+    buffer = io.BytesIO()
 
+    # mesmos parâmetros do st.pyplot
+    fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
 
-try:
-    st.image("image001 (1).png", use_container_width=False, width=1000)
-except TypeError:
-    st.image("image001 (1).png", use_column_width=False, width=1000)
+    plt.close(fig)
 
-st.markdown("### 1️⃣ Envie os arquivos .txt para processar (seleção múltipla)")
+    return buffer.getvalue()
 
-uploaded_files = st.file_uploader(
-    "Selecionar arquivos",
-    type=["txt"],
-    accept_multiple_files=True
-)
+# Tamanhos de página da prévia (só a página exibida é formatada)
+PREVIEW_PAGE_SIZES = [15, 50, 100, 500]
 
-# Caminho da memória histórica
-HIST_PATH = os.path.join(os.getcwd(), "prisma_historico.parquet")
+# Tendência: meses exibidos ao abrir e linhas no gráfico (maiores totais)
+TREND_DEFAULT_MONTHS = 12
+TREND_TOP_SERIES = 10
 
 # ------------------- Pré-filtragem upload -------------------
 
@@ -413,51 +245,14 @@ if uploaded_files:
 
     for idx, f in enumerate(uploaded_files, start=1):
 
-        try:
-            content = f.read().decode("utf-8", errors="ignore")
-        except Exception:
-            f.seek(0)
-            content = f.read().decode("latin-1", errors="ignore")
-
-        periodo = detect_periodo_first_lines(content)
-
-        label = periodo_label_br(periodo)
-
-        dt_ini, dt_fim = parse_periodo_to_dates(periodo)
-
-        file_infos_all.append({
-
-            "name": getattr(f, "name", "arquivo.txt"),
-            "text": content,
-
-            "period": periodo,
-            "label": label,
-
-            "ini": dt_ini,
-            "fim": dt_fim,
-
-            "upload_seq": idx
-
-        })
-
-    df_files = pd.DataFrame(file_infos_all)
-
-    if not df_files.empty:
-
-        df_files["_fim_ord"] = pd.to_datetime(df_files["fim"], errors="coerce")
-
-        df_files = df_files.sort_values(
-            by=["label", "_fim_ord", "upload_seq"],
-            ascending=[True, False, False]
+        # apenas o cabeçalho é lido aqui; o conteúdo é processado em streaming depois
+        file_infos_all.append(
+            scan_file(f, getattr(f, "name", "arquivo.txt"), idx)
         )
 
-        mask_dup = df_files.duplicated(subset=["label"], keep="first")
+    kept_infos, discarded_infos = select_files(file_infos_all)
 
-        kept_df = df_files[~mask_dup].copy()
-        disc_df = df_files[mask_dup].copy()
-
-        kept_infos = kept_df.to_dict(orient="records")
-        discarded_infos = disc_df.to_dict(orient="records")
+    if file_infos_all:
 
         st.markdown("#### 📄 Arquivos válidos para processamento")
 
@@ -471,7 +266,8 @@ if uploaded_files:
             )
 
             st.markdown(
-                f"✅ **{r['name']}** — Período: {r['period']} • Label: {lbl_txt}"
+                f"✅ **{r['name']}** — Período: {r['period']} • Label: {lbl_txt} • Extração: {r['extracao'] or '-'} "
+                f"• Codificação: {r['encoding'] or 'ASCII'}"
             )
 
         if len(discarded_infos) > 0:
@@ -489,7 +285,7 @@ if uploaded_files:
                 )
 
                 st.markdown(
-                    f"🗑️ {r['name']} — Período: {r['period']} • Label: {lbl_txt}"
+                    f"🗑️ {r['name']} — Período: {r['period']} • Label: {lbl_txt} • Extração: {r['extracao'] or '-'}"
                 )
 
         if len(kept_infos) > 0:
@@ -510,249 +306,252 @@ if uploaded_files:
 
     # ------------------- Processamento -------------------
 
-    df = process_multiple_texts(kept_infos)
-
-    # ------------------- DE PARA SETOR -------------------
-
-    depara_path = os.path.join(os.getcwd(), "DE PARA SETOR.xlsx")
-
-    if os.path.exists(depara_path) and not df.empty:
-
-        df_depara = pd.read_excel(depara_path, header=0)
-
-        df_depara.columns = df_depara.columns.str.strip()
-
-        if len(df_depara.columns) >= 2:
-
-            col_setor = df_depara.columns[0]
-            col_correlata = df_depara.columns[1]
-
-            df = df.merge(
-                df_depara[[col_setor, col_correlata]],
-                how="left",
-                left_on="Setor",
-                right_on=col_setor
-            )
+    # planilha DE PARA alterada em disco refaz o consolidado e regrava o histórico
+    assinatura_depara = depara_signature(DEPARA_PATH)
 
-            df.insert(
-                df.columns.get_loc("Setor") + 1,
-                "Setor Agrupado",
-                df[col_correlata]
-            )
+    # leitura + setor + contagem: refeitas só se arquivos, opções ou DE PARA mudarem
+    chave_consolidado = (
+        tuple(chave_arquivo(r["file"]) for r in kept_infos),
+        int(parse_workers) if parse_paralelo else 0,
+        esquema_compacto,
+        assinatura_depara,
+    )
 
-            df["Setor Agrupado"].fillna(
-                "*SOLICITAR ASSOCIAÇÃO DE SETOR*",
-                inplace=True
-            )
+    df, tempos, memoria, label_mais_recente = etapa(
+        "consolidado",
+        chave_consolidado,
+        lambda: consolidar_upload(
+            kept_infos,
+            int(parse_workers) if parse_paralelo else 0,
+            esquema_compacto
+        )
+    )
 
-            df.drop(columns=[col_setor, col_correlata], inplace=True)
+    for r, t in zip(kept_infos, tempos):
+        r.update(t)
 
-    # ------------------- Ordenação -------------------
+    if kept_infos:
 
-    if not df.empty:
+        with st.expander("⏱️ Tempo de processamento por arquivo"):
 
-        if "Setor Agrupado" in df.columns:
+            for r in kept_infos:
 
-            df.sort_values(
-                by=["Registro", "Setor Agrupado"],
-                inplace=True,
-                ignore_index=True
-            )
+                registros = f"{r['registros']:,}".replace(",", ".")
+                segundos = f"{r['tempo_parse']:.2f}".replace(".", ",")
 
-            df["Cont. Pac.&Setor Unico"] = (
+                origem = " (cache)" if r["cache"] else ""
 
-                ~df.duplicated(
-                    subset=["Registro", "Setor Agrupado", "Período Label"],
-                    keep="first"
+                st.markdown(
+                    f"**{r['name']}** — {registros} registros em {segundos} s{origem}"
                 )
 
-            ).astype(int)
-
-        else:
+    if memoria is not None:
 
-            df.sort_values(
-                by=["Registro", "Setor"],
-                inplace=True,
-                ignore_index=True
-            )
+        st.caption(
+            f"🧮 Memória do consolidado: {memoria[0]:.1f} MB → {memoria[1]:.1f} MB".replace(".", ",")
+        )
 
-            df["Cont. Pac.&Setor Unico"] = (
+    # df não é mais alterado depois daqui (fica guardado na sessão)
+    df_export = df
 
-                ~df.duplicated(
-                    subset=["Registro", "Setor", "Período Label"],
-                    keep="first"
-                )
+    # ------------------- Prévia -------------------
 
-            ).astype(int)
+    st.markdown(
+        "### 2️⃣ Prévia de conversão do Protocolo Prisma (consolidada)"
+    )
 
-    # ------------------- Conversões numéricas -------------------
+    # apenas as linhas da página exibida são copiadas e formatadas
+    col_pag1, col_pag2 = st.columns([1, 1])
 
-    df_export = df.copy()
+    with col_pag1:
+        linhas_pagina = st.selectbox(
+            "Linhas por página",
+            options=PREVIEW_PAGE_SIZES,
+            index=0
+        )
 
-    for c in ["Qtd. Total", "Custo Atual", "Consumo Total"]:
+    total_paginas = max(1, ceil(len(df) / linhas_pagina))
 
-        df_export[c] = pd.to_numeric(df_export[c], errors="coerce")
+    with col_pag2:
+        pagina = st.number_input(
+            "Página",
+            min_value=1,
+            max_value=total_paginas,
+            value=1,
+            step=1
+        )
 
-    # ------------------- Prévia -------------------
+    ini_pagina = (int(pagina) - 1) * linhas_pagina
 
-    st.markdown(
-        "### 2️⃣ Prévia de conversão do Protocolo Prisma (consolidada)"
+    # Per_Inicio / Per_Fim são colunas auxiliares (não aparecem na prévia)
+    df_preview = df.iloc[ini_pagina:ini_pagina + linhas_pagina].drop(
+        columns=["Per_Inicio", "Per_Fim"],
+        errors="ignore"
     )
 
-    df_preview = df.copy()
+    st.caption(
+        f"Linhas {min(ini_pagina + 1, len(df)):,}–{ini_pagina + len(df_preview):,} "
+        f"de {len(df):,} · página {int(pagina)} de {total_paginas}".replace(",", ".")
+    )
 
-    # formatar números BR
+    # formatar números BR (coluna inteira de uma vez)
 
     for c in ["Qtd. Total", "Custo Atual", "Consumo Total"]:
 
-        df_preview[c] = df_preview[c].apply(br_format)
+        df_preview[c] = br_format_array(df_preview[c])
 
     # formatar DATA visualmente
 
     if "Período Label" in df_preview.columns:
 
-        df_preview["Período Label"] = pd.to_datetime(
-            df_preview["Período Label"],
-            errors="coerce"
-        ).dt.strftime("%d/%b/%y")
+        df_preview["Período Label"] = periodo_label_text(df_preview["Período Label"])
+
+    for c in ["Entrada", "Alta"]:
+
+        if c in df_preview.columns and pd.api.types.is_datetime64_any_dtype(df_preview[c]):
+            df_preview[c] = df_preview[c].dt.strftime("%d/%m/%Y").fillna("")
 
     st.dataframe(
-        df_preview.head(15),
+        df_preview,
         use_container_width=True
     )
-    # ------------------- Escolher mês mais recente -------------------
-
-    df_export[["Per_Inicio", "Per_Fim"]] = df_export["Período"].apply(
-        lambda s: pd.Series(parse_periodo_to_dates(s))
+    # ------------------- Memória histórica -------------------
+
+    # pyarrow.parquet só é importado quando há arquivos (não na partida do app)
+    from prisma.historico import (
+        clear_history,
+        history_months,
+        load_cube,
+        load_history,
+        migrate_legacy_history,
+        partition_mtime,
+        upsert_history,
     )
 
-    if not df_export.empty:
+    try:
+        migrate_legacy_history(HIST_PATH, HIST_LEGACY_PATH)
+    except Exception as e:
+        st.warning(f"Falha ao converter a memória histórica antiga: {e}")
+
+    # grava apenas quando o conjunto de arquivos ou o DE PARA muda (não a cada clique)
+    assinatura_hist = (
+        tuple(r.get("cache_key") or r["name"] for r in kept_infos),
+        assinatura_depara,
+    )
 
-        df_label_maxfim = (
-            df_export.groupby("Período Label")["Per_Fim"]
-            .max()
-            .reset_index()
-            .dropna(subset=["Per_Fim"])
-        )
+    if not df_export.empty and st.session_state.get("hist_assinatura") != assinatura_hist:
 
-        if not df_label_maxfim.empty:
+        try:
 
-            label_mais_recente = df_label_maxfim.loc[
-                df_label_maxfim["Per_Fim"].idxmax(),
-                "Período Label"
-            ]
+            st.session_state["hist_resultado"] = upsert_history(df_export, HIST_PATH)
+            st.session_state["hist_assinatura"] = assinatura_hist
 
-            df_consolidado = df_export[
-                df_export["Período Label"] == label_mais_recente
-            ].copy()
+        except Exception as e:
 
-            periodo_mais_recente = df_consolidado.iloc[0]["Período"]
+            st.warning(
+                f"Falha ao gravar memória histórica: {e}"
+            )
 
-        else:
+    hist_resultado = st.session_state.get("hist_resultado")
 
-            df_consolidado = df_export.copy()
-            periodo_mais_recente = ""
+    if hist_resultado:
 
-    else:
+        if hist_resultado["gravados"]:
 
-        df_consolidado = df_export.copy()
-        periodo_mais_recente = ""
+            st.caption(
+                "💾 Memória histórica atualizada: "
+                + ", ".join(pd.to_datetime(x).strftime("%d/%b/%y") for x in hist_resultado["gravados"])
+            )
 
-    # ------------------- Gráfico principal -------------------
+        if hist_resultado["mantidos"]:
 
-    st.markdown(
-        "### 3️⃣ VOLUME DE ATENDIMENTO, COM CONSUMO MENSAL, POR SETOR AGRUPADO (CONSOLIDADO)"
-    )
+            st.caption(
+                "📌 Mantido o histórico (período mais completo já gravado): "
+                + ", ".join(pd.to_datetime(x).strftime("%d/%b/%y") for x in hist_resultado["mantidos"])
+            )
 
-    coluna_setor = (
-        "Setor Agrupado"
-        if "Setor Agrupado" in df_consolidado.columns
-        else "Setor"
-    )
+    try:
+        meses_hist = history_months(HIST_PATH)
+    except Exception:
+        meses_hist = []
 
-    agrupamento = (
+    # ------------------- Escolher mês do consolidado -------------------
 
-        df_consolidado
-        .groupby(coluna_setor)["Cont. Pac.&Setor Unico"]
-        .sum()
-        .sort_values(ascending=False)
+    meses_upload = sorted(df_export["Período Label"].dropna().unique()) if not df_export.empty else []
 
-    )
+    meses_opcoes = sorted(set(pd.to_datetime(meses_upload)) | set(meses_hist))
 
-    cmap = plt.cm.get_cmap("tab20", len(agrupamento))
-    cores = [cmap(i) for i in range(len(agrupamento))]
+    if label_mais_recente is not None and meses_opcoes:
 
-    fig, ax = plt.subplots(figsize=(8, 3))
+        mes_consolidado = st.selectbox(
+            "Mês do consolidado",
+            meses_opcoes,
+            index=meses_opcoes.index(pd.Timestamp(label_mais_recente)),
+            format_func=lambda d: d.strftime("%d/%b/%y")
+        )
 
-    bars = ax.bar(
-        agrupamento.index,
-        agrupamento.values,
-        color=cores
-    )
+        mes_no_historico = mes_consolidado in meses_hist
 
-    for bar, cor in zip(bars, cores):
+        # o histórico guarda a versão vencedora do mês ("último do mês")
+        chave_mes = (
+            chave_consolidado,
+            mes_consolidado,
+            partition_mtime(HIST_PATH, mes_consolidado) if mes_no_historico else None,
+        )
 
-        bar.set_zorder(2)
+        def carregar_mes():
 
-        ax.add_patch(
+            if mes_no_historico:
+                return load_history(HIST_PATH, meses=[mes_consolidado], compact=esquema_compacto)
 
-            Rectangle(
-                (bar.get_x(), 0),
-                bar.get_width(),
-                bar.get_height(),
-                facecolor=cor,
-                alpha=0.15,
-                zorder=1
-            )
+            return df_export[
+                df_export["Período Label"] == mes_consolidado
+            ].copy()
 
-        )
+        df_consolidado = etapa("mes", chave_mes, carregar_mes)
 
-    ax.set_title(
-        "Volume de Atendimento por Setor Agrupado",
-        fontsize=7,
-        fontweight="bold"
-    )
+        periodo_mais_recente = df_consolidado.iloc[0]["Período"]
 
-    ax.set_yticks([])
+    else:
 
-    plt.xticks(rotation=45, ha="right", fontsize=6)
+        mes_no_historico = False
 
-    for i, v in enumerate(agrupamento):
+        chave_mes = (chave_consolidado, None, None)
 
-        ax.text(
-            i,
-            v,
-            f"{int(v):,}".replace(",", "."),
-            ha="center",
-            va="bottom",
-            fontsize=7,
-            fontweight="bold"
-        )
-
-    st.pyplot(fig)
+        df_consolidado = df_export
+        periodo_mais_recente = ""
 
-    # ------------------- Tabela Resumo -------------------
+    # ------------------- Gráfico principal -------------------
 
     st.markdown(
-        "#### 📊 RESUMO DE ATENDIMENTO POR SETOR AGRUPADO"
+        "### 3️⃣ VOLUME DE ATENDIMENTO, COM CONSUMO MENSAL, POR SETOR AGRUPADO (CONSOLIDADO)"
     )
 
-    df_resumo = agrupamento.reset_index()
+    def resumir():
 
-    df_resumo.columns = [
-        "Setor Agrupado",
-        "Volume de Atendimentos"
-    ]
+        # mês do histórico: lido do cubo pré-agregado (poucas linhas)
+        if mes_no_historico:
+            volume = volume_by_setor(load_cube(HIST_PATH, meses=[mes_consolidado]))
+        else:
+            volume = volume_by_setor(df_consolidado)
 
-    if not df_resumo.empty:
+        return volume, summary_table(volume)
+
+    agrupamento, df_resumo = etapa("resumo", chave_mes, resumir)
+
+    png_setores = etapa(
+        "grafico",
+        chave_mes,
+        lambda: grafico_setores_png(agrupamento)
+    )
 
-        df_resumo["% do Total"] = (
+    st.image(png_setores, use_container_width=True)
 
-            df_resumo["Volume de Atendimentos"]
-            / df_resumo["Volume de Atendimentos"].sum()
-            * 100
+    # ------------------- Tabela Resumo -------------------
 
-        ).round(2)
+    st.markdown(
+        "#### 📊 RESUMO DE ATENDIMENTO POR SETOR AGRUPADO"
+    )
 
     st.dataframe(df_resumo, use_container_width=True)
 
@@ -764,6 +563,8 @@ if uploaded_files:
 
     if not df_resumo.empty:
 
+        import plotly.express as px
+
         fig_pie = px.pie(
             df_resumo,
             names="Setor Agrupado",
@@ -776,6 +577,73 @@ if uploaded_files:
             use_container_width=True
         )
 
+    # ------------------- Tendência mensal -------------------
+
+    if len(meses_hist) >= 2:
+
+        st.markdown(
+            "### 4️⃣ Tendência mensal (memória histórica)"
+        )
+
+        col_tend1, col_tend2, col_tend3 = st.columns([2, 1, 1])
+
+        with col_tend1:
+            mes_inicio, mes_fim = st.select_slider(
+                "Meses",
+                options=meses_hist,
+                value=(meses_hist[max(0, len(meses_hist) - TREND_DEFAULT_MONTHS)], meses_hist[-1]),
+                format_func=lambda d: d.strftime("%b/%y")
+            )
+
+        with col_tend2:
+            dimensao = st.selectbox(
+                "Agrupar por",
+                ["Setor Agrupado", "Convênio", "Tipo de Produto"]
+            )
+
+        with col_tend3:
+            medida = st.selectbox(
+                "Medida",
+                list(TREND_MEASURES)
+            )
+
+        # cada mês regravado no histórico muda a chave
+        chave_tendencia = (
+            tuple(partition_mtime(HIST_PATH, m) for m in meses_hist),
+            mes_inicio,
+            mes_fim,
+            dimensao,
+            medida,
+        )
+
+        def tendencia():
+
+            # só o cubo mensal é lido (poucas centenas de linhas por mês)
+            cubo = load_cube(HIST_PATH, inicio=mes_inicio, fim=mes_fim)
+
+            coluna = setor_column(cubo) if dimensao == "Setor Agrupado" else dimensao
+
+            matriz = trend_matrix(cubo, coluna, medida)
+
+            return matriz, trend_table(matriz)
+
+        matriz_tendencia, df_tendencia = etapa("tendencia", chave_tendencia, tendencia)
+
+        if not matriz_tendencia.empty:
+
+            st.line_chart(matriz_tendencia.iloc[:, :TREND_TOP_SERIES])
+
+            st.caption(
+                f"Variação sobre o mês anterior e média móvel em {mes_fim:%b/%y}"
+            )
+
+            st.dataframe(
+                df_tendencia[df_tendencia["Período Label"] == mes_fim]
+                .drop(columns="Período Label")
+                .sort_values("Valor", ascending=False, kind="stable"),
+                use_container_width=True
+            )
+
     # ------------------- Exportação Excel -------------------
 
     st.markdown(
@@ -784,70 +652,101 @@ if uploaded_files:
 
     if not df_consolidado.empty:
 
-        buffer = io.BytesIO()
+        # xlsxwriter / pyarrow só são importados na seção de exportação
+        from prisma.excel import excel_bytes
+        from prisma.export import EXPORT_FORMATS, export_bytes
 
-        with pd.ExcelWriter(
-            buffer,
-            engine="openpyxl"
-        ) as writer:
+        periodo_nome = pd.to_datetime(
+            df_consolidado.iloc[0]["Período Label"]
+        ).strftime("%Y_%m")
 
-            df_consolidado.to_excel(
-                writer,
-                index=False,
-                sheet_name="Protocolo Prisma"
-            )
+        # o .xlsx só é montado quando pedido; fica na sessão até o consolidado mudar
+        assinatura_excel = chave_mes
 
-            df_resumo.to_excel(
-                writer,
-                index=False,
-                sheet_name="Resumo"
-            )
+        if st.session_state.get("excel_assinatura") != assinatura_excel:
+            st.session_state.pop("excel_bytes", None)
+
+        if "excel_bytes" not in st.session_state:
 
-            # -------------------
-            # FORMATAÇÃO DATA EXCEL
-            # -------------------
+            if st.button("⚙️ Gerar Excel"):
 
-            ws = writer.book["Protocolo Prisma"]
+                with st.spinner("Gerando Excel..."):
 
-            col_index = list(df_consolidado.columns).index(
-                "Período Label"
-            ) + 1
+                    st.session_state["excel_bytes"] = excel_bytes(
+                        {
+                            "Protocolo Prisma": df_consolidado,
+                            "Resumo": df_resumo,
+                        },
+                        column_formats={"Período Label": "DD/MMM/YY"}
+                    )
 
-            from openpyxl.styles import numbers
+                    st.session_state["excel_assinatura"] = assinatura_excel
 
-            for row in ws.iter_rows(
-                min_row=2,
-                min_col=col_index,
-                max_col=col_index
-            ):
+        if "excel_bytes" in st.session_state:
 
-                for cell in row:
+            st.download_button(
 
-                    cell.number_format = "DD/MMM/YY"
+                label="📥 Baixar Excel Gerado",
 
-        buffer.seek(0)
+                data=st.session_state["excel_bytes"],
 
-        periodo_nome = ""
+                file_name=f"Prot_Prisma_{periodo_nome}.xlsx",
 
-        if not df_consolidado.empty:
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
-            d = pd.to_datetime(
-                df_consolidado.iloc[0]["Período Label"]
             )
 
-            periodo_nome = d.strftime("%Y_%m")
+        # ------------------- Outros formatos (BI) -------------------
 
-        st.download_button(
+        formato_export = st.radio(
+            "Outros formatos (para BI / reimportação)",
+            list(EXPORT_FORMATS),
+            horizontal=True
+        )
 
-            label="📥 Baixar Excel Gerado",
+        extensao, mime = EXPORT_FORMATS[formato_export]
 
-            data=buffer,
+        # como o Excel: gerado só quando pedido, para o formato escolhido,
+        # e guardado na sessão até o consolidado ou o formato mudar
+        chave_export = (assinatura_excel, formato_export)
 
-            file_name=f"Prot_Prisma_{periodo_nome}.xlsx",
+        if st.session_state.get("export_chave") != chave_export:
+            st.session_state.pop("export_arquivos", None)
 
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        if "export_arquivos" not in st.session_state:
 
-        )
+            if st.button(f"⚙️ Gerar {formato_export}"):
+
+                with st.spinner(f"Gerando {formato_export}..."):
+
+                    st.session_state["export_arquivos"] = (
+                        export_bytes(df_consolidado, formato_export),
+                        export_bytes(df_resumo, formato_export),
+                    )
+
+                    st.session_state["export_chave"] = chave_export
+
+        if "export_arquivos" in st.session_state:
+
+            dados_consolidado, dados_resumo = st.session_state["export_arquivos"]
+
+            col_exp1, col_exp2 = st.columns([1, 1])
+
+            with col_exp1:
+                st.download_button(
+                    label=f"📦 Baixar consolidado ({formato_export})",
+                    data=dados_consolidado,
+                    file_name=f"Prot_Prisma_{periodo_nome}{extensao}",
+                    mime=mime
+                )
+
+            with col_exp2:
+                st.download_button(
+                    label=f"📦 Baixar resumo ({formato_export})",
+                    data=dados_resumo,
+                    file_name=f"Prot_Prisma_Resumo_{periodo_nome}{extensao}",
+                    mime=mime
+                )
 
     # ------------------- Limpar memória histórica -------------------
 
@@ -857,9 +756,11 @@ if uploaded_files:
 
         try:
 
-            if os.path.exists(HIST_PATH):
+            if clear_history(HIST_PATH):
 
-                os.remove(HIST_PATH)
+                # a assinatura fica: os mesmos arquivos não são regravados no próximo
+                # rerun (só quando os arquivos enviados ou o DE PARA mudarem)
+                st.session_state.pop("hist_resultado", None)
 
                 st.success(
                     "Memória histórica apagada com sucesso."
@@ -0,0 +1,65 @@
+# ============================================================
+# benchmarks/bench_encoding.py — Mesmo relatório sintético em utf-8, utf-8 com BOM,
+# cp1252 e latin-1: codificação escolhida e velocidade de leitura
+# (a conferência de período e registros fica em tests/test_encoding.py)
+# Uso: python -m benchmarks.bench_encoding [n_pacientes_por_setor]
+# ============================================================
+
+import io
+import sys
+import time
+
+from benchmarks.sintetico import gerar_relatorio
+from prisma.parser import process_txt_file
+from prisma.pipeline import scan_file
+
+CODIFICACOES = ["utf-8", "utf-8-sig", "cp1252", "latin-1"]
+
+
+def corpus(n_pacientes: int) -> dict:
+    """
+    {nome: texto}: o relatório padrão, com acentos nos nomes e setores, e uma
+    variante com o cabeçalho só em ASCII (a codificação só aparece no corpo).
+    """
+
+    texto = (
+        gerar_relatorio(n_pacientes=n_pacientes)
+        .replace("DA SILVA", "DA CONCEIÇÃO")
+        .replace("CENTRO CIRURGICO", "CENTRO CIRÚRGICO")
+        .replace("BRADESCO SAUDE", "BRADESCO SAÚDE")
+    )
+
+    return {
+        "acentuado": texto,
+        "cabeçalho ASCII": texto.replace("Período", "Periodo").replace("Pág.", "Pag."),
+    }
+
+
+def main(argv=None):
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    n_pacientes = int(argv[0]) if argv else 500
+
+    for nome, texto in corpus(n_pacientes).items():
+
+        print(nome)
+
+        for codificacao in CODIFICACOES:
+
+            dados = texto.encode(codificacao)
+
+            info = scan_file(io.BytesIO(dados), "sintetico.txt", 1)
+
+            t0 = time.perf_counter()
+            df = process_txt_file(io.BytesIO(dados), "sintetico.txt", 1, encoding=info["encoding"])
+            segundos = time.perf_counter() - t0
+
+            print(
+                f"  {codificacao:<10} detectada: {info['encoding'] or 'ASCII':<10} "
+                f"{len(df):,} registros  {len(dados) / (1024 * 1024) / segundos:6.1f} MB/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# ============================================================
+# benchmarks/bench_excel.py — Exportação Excel: segundos e pico de memória (RSS)
+# Compara o código anterior (openpyxl + formatação célula a célula)
+# com prisma.excel (xlsxwriter, formatos por coluna)
+# Uso: python -m benchmarks.bench_excel [linhas ...]   (padrão: 100000 500000)
+# ============================================================
+
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import pandas as pd
+
+from benchmarks.sintetico import gerar_relatorio
+from prisma.excel import excel_bytes
+from prisma.parser import periodo_dates_frame, process_txt_content
+
+MODOS = ("openpyxl", "xlsxwriter")
+
+
+def consolidado_sintetico(linhas: int) -> pd.DataFrame:
+    """
+    DataFrame com as colunas do consolidado, repetindo um relatório sintético até 'linhas'.
+    """
+
+    base = process_txt_content(gerar_relatorio(n_pacientes=500), "sintetico.txt", 1)
+
+    df = pd.concat([base] * (linhas // len(base) + 1), ignore_index=True).head(linhas)
+
+    df.insert(df.columns.get_loc("Setor") + 1, "Setor Agrupado", df["Setor"])
+
+    df["Cont. Pac.&Setor Unico"] = 1
+
+    df[["Per_Inicio", "Per_Fim"]] = periodo_dates_frame(df["Período"])
+
+    return df
+
+
+def exportar_openpyxl(df_consolidado: pd.DataFrame, df_resumo: pd.DataFrame) -> bytes:
+    """
+    Exportação como era feita no app.py antes de prisma.excel.
+    """
+
+    buffer = io.BytesIO()
+
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+
+        df_consolidado.to_excel(writer, index=False, sheet_name="Protocolo Prisma")
+        df_resumo.to_excel(writer, index=False, sheet_name="Resumo")
+
+        ws = writer.book["Protocolo Prisma"]
+
+        col_index = list(df_consolidado.columns).index("Período Label") + 1
+
+        for row in ws.iter_rows(min_row=2, min_col=col_index, max_col=col_index):
+            for cell in row:
+                cell.number_format = "DD/MMM/YY"
+
+    return buffer.getvalue()
+
+
+def medir(modo: str, linhas: int) -> dict:
+    """
+    Executado em processo próprio: o pico de RSS não se mistura entre modos.
+    """
+
+    df = consolidado_sintetico(linhas)
+
+    df_resumo = (
+        df.groupby("Setor Agrupado")["Cont. Pac.&Setor Unico"].sum().reset_index()
+    )
+
+    rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    t0 = time.perf_counter()
+
+    if modo == "openpyxl":
+        dados = exportar_openpyxl(df, df_resumo)
+    else:
+        dados = excel_bytes(
+            {"Protocolo Prisma": df, "Resumo": df_resumo},
+            column_formats={"Período Label": "DD/MMM/YY"}
+        )
+
+    segundos = time.perf_counter() - t0
+
+    rss_depois = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss em KB (Linux)
+    return {
+        "segundos": segundos,
+        "pico_mb": rss_depois / 1024,
+        "acrescimo_mb": (rss_depois - rss_antes) / 1024,
+        "arquivo_mb": len(dados) / (1024 * 1024),
+    }
+
+
+def main(argv=None):
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv and argv[0] == "--filho":
+        print(json.dumps(medir(argv[1], int(argv[2]))))
+        return
+
+    tamanhos = [int(a) for a in argv] or [100_000, 500_000]
+
+    print(f"{'linhas':>9}  {'modo':<10}  {'segundos':>9}  {'pico RSS':>9}  {'+RSS':>8}  {'arquivo':>8}")
+
+    for linhas in tamanhos:
+
+        for modo in MODOS:
+
+            saida = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_excel", "--filho", modo, str(linhas)],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+
+            r = json.loads(saida.stdout.strip().splitlines()[-1])
+
+            print(
+                f"{linhas:>9,}  {modo:<10}  {r['segundos']:>9.1f}  {r['pico_mb']:>6.0f} MB"
+                f"  {r['acrescimo_mb']:>5.0f} MB  {r['arquivo_mb']:>5.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
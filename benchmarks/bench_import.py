@@ -0,0 +1,84 @@
+# ============================================================
+# benchmarks/bench_import.py — Tempo de importação (python -X importtime)
+# Mede o núcleo (prisma.*) e os imports de topo do app.py (partida do Streamlit)
+# Uso: python -m benchmarks.bench_import [repetições]
+# ============================================================
+
+import ast
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ALVOS = [
+    "prisma.parser",
+    "prisma.pipeline",
+    "prisma.cli",
+]
+
+
+def app_imports() -> str:
+    """
+    Os imports de nível de módulo do app.py (os de dentro dos blocos ficam de fora),
+    como código executável.
+    """
+
+    with open(os.path.join(RAIZ, "app.py"), encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+
+    return "\n".join(
+        ast.unparse(no)
+        for no in arvore.body
+        if isinstance(no, (ast.Import, ast.ImportFrom))
+    )
+
+
+def import_time_ms(codigo: str) -> float:
+    """
+    Soma do tempo cumulativo dos imports de primeiro nível, em ms,
+    num interpretador novo.
+    """
+
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", codigo],
+        capture_output=True,
+        text=True,
+        cwd=RAIZ,
+        check=True
+    )
+
+    total_us = 0
+
+    for linha in saida.stderr.splitlines():
+
+        if not linha.startswith("import time:") or "cumulative" in linha:
+            continue
+
+        _, cumulativo, modulo = linha.split("|")
+
+        # só os imports feitos diretamente (sem recuo): os aninhados já estão no cumulativo
+        if not modulo.startswith("  "):
+            total_us += int(cumulativo)
+
+    return total_us / 1000
+
+
+def main(argv=None):
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    repeticoes = int(argv[0]) if argv else 5
+
+    casos = [(f"import {m}", f"import {m}") for m in ALVOS]
+    casos.append(("app.py (imports de topo)", app_imports()))
+
+    for nome, codigo in casos:
+
+        melhor = min(import_time_ms(codigo) for _ in range(repeticoes))
+
+        print(f"{nome:<28} {melhor:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# ============================================================
+# benchmarks/bench_paciente.py — Linhas 'Paciente:' por segundo: extrator de
+# busca única contra a leitura campo a campo
+# (a conferência dos dois fica em tests/test_paciente.py)
+# Uso: python -m benchmarks.bench_paciente
+# ============================================================
+
+import time
+
+from benchmarks.sintetico import gerar_relatorio
+from prisma.parser import _parse_paciente_line_generico, parse_paciente_line
+
+
+def main():
+
+    linhas = [
+        line for line in gerar_relatorio(n_pacientes=3000).splitlines()
+        if line.startswith("Paciente:")
+    ]
+
+    for nome, func in (
+        ("campo a campo", _parse_paciente_line_generico),
+        ("busca única", parse_paciente_line),
+    ):
+
+        melhor = None
+
+        for _ in range(3):
+
+            t0 = time.perf_counter()
+
+            for line in linhas:
+                func(line)
+
+            segundos = time.perf_counter() - t0
+
+            melhor = segundos if melhor is None else min(melhor, segundos)
+
+        print(f"{nome + ':':<18} {len(linhas) / melhor:,.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# ============================================================
+# benchmarks/bench_parser.py — Registros/s e linhas/s do parser (process_txt_content)
+# e linhas/s só da classificação de linhas (LineClassifier)
+# Uso: python -m benchmarks.bench_parser [n_pacientes_por_setor]
+# ============================================================
+
+import sys
+import time
+
+from benchmarks.sintetico import gerar_relatorio
+from prisma.parser import DEFAULT_CLASSIFIER, process_txt_content
+
+
+def melhor_de_3(func) -> float:
+
+    melhor = None
+
+    for _ in range(3):
+
+        t0 = time.perf_counter()
+        func()
+        segundos = time.perf_counter() - t0
+
+        melhor = segundos if melhor is None else min(melhor, segundos)
+
+    return melhor
+
+
+def main(argv=None):
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    n_pacientes = int(argv[0]) if argv else 3000
+
+    texto = gerar_relatorio(n_pacientes=n_pacientes)
+
+    df = process_txt_content(texto, "sintetico.txt", 1)
+
+    melhor = melhor_de_3(lambda: process_txt_content(texto, "sintetico.txt", 1))
+
+    linhas = texto.splitlines()
+
+    classify = DEFAULT_CLASSIFIER.classify
+
+    melhor_classificacao = melhor_de_3(lambda: [classify(line) for line in linhas])
+
+    mb = len(texto.encode("utf-8")) / (1024 * 1024)
+
+    print(f"linhas do arquivo: {len(linhas):,}  ({mb:.1f} MB)")
+    print(f"registros:         {len(df):,}")
+    print(f"melhor de 3:       {melhor:.3f} s")
+    print(f"registros/s:       {len(df) / melhor:,.0f}")
+    print(f"linhas/s:          {len(linhas) / melhor:,.0f}")
+    print(f"MB/s:              {mb / melhor:,.1f}")
+    print(f"classificação:     {len(linhas) / melhor_classificacao:,.0f} linhas/s")
+
+
+if __name__ == "__main__":
+    main()
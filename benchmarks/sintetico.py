@@ -0,0 +1,100 @@
+# ============================================================
+# benchmarks/sintetico.py — Gerador de relatórios Sishop sintéticos
+# (Consumo Normal, layout de texto exportado) para medições de desempenho
+# ============================================================
+
+import random
+
+SETORES = [
+    "0038 - CENTRO CIRURGICO",
+    "0167 - UTI GERAL",
+    "0065 - HV PS ADULTO",
+    "0054 - IMAGENS-TOMOGRAFIA",
+    "0301 - HS APT 2 ALA 1",
+    "0288 - UTI SAMARITANO",
+]
+
+CONVENIOS = ["UNIMED", "BRADESCO SAUDE", "SULAMERICA", "PARTICULAR", "AMIL"]
+
+TIPOS = ["MEDICAMENTOS", "MATERIAIS", "DIETAS", "GASES"]
+
+
+def _cabecalho(periodo: str, data: str, pagina: int) -> list:
+    return [
+        f'"AMERICAS MEDICAL CITY",,,,"Pág.: {pagina}"',
+        f'"Consumo Normal",,,Data:,{data}',
+        f'"Período: {periodo}",,,',
+        '"Produto","Qtd.","Custo Atual","Consumo Total"',
+    ]
+
+
+def _fmt(x: float) -> str:
+    return f'"{x:,.2f}"'
+
+
+def gerar_relatorio(
+    mes: int = 1,
+    ano: int = 2025,
+    n_setores: int = 6,
+    n_pacientes: int = 200,
+    seed: int = 0,
+    ultimo_dia: int = 28
+) -> str:
+    """
+    Texto de um relatório com n_setores x n_pacientes pacientes, quebras de página
+    (cabeçalho/rodapé repetidos) e de 1 a 3 tipos de produto por paciente.
+    """
+
+    r = random.Random(seed)
+
+    periodo = f"01/{mes:02d}/{ano} a {ultimo_dia:02d}/{mes:02d}/{ano}"
+    data = f"05/{mes % 12 + 1:02d}/{ano}"
+
+    out = _cabecalho(periodo, data, 1)
+    pagina = 1
+    registro = 100000 * mes
+
+    for s in range(n_setores):
+
+        out.append(f'Setor:,"{SETORES[(s + seed) % len(SETORES)]}"')
+
+        for _ in range(n_pacientes):
+
+            registro += r.randint(1, 3)
+
+            entrada = f"{r.randint(1, 28):02d}/{mes:02d}/{ano}"
+            alta = "" if r.random() < 0.2 else f"{r.randint(1, 28):02d}/{mes:02d}/{ano}"
+
+            out.append(
+                f'Paciente:,"{registro} - PACIENTE {registro} DA SILVA  Entrada: {entrada}  '
+                f'Alta: {alta}  Convênio: {r.choice(CONVENIOS)}  Plano: PLANO {r.randint(1, 3)}"'
+            )
+
+            for tipo in r.sample(TIPOS, r.randint(1, 3)):
+
+                out.append(f'"Tipo de Produto:","{tipo}"')
+
+                qtd_total = consumo_total = 0
+
+                for k in range(r.randint(1, 4)):
+
+                    qtd = r.randint(1, 2000)
+                    custo = r.random() * 50
+
+                    qtd_total += qtd
+                    consumo_total += qtd * custo
+
+                    out.append(f'"ITEM {k}",{_fmt(qtd)},{_fmt(custo)},{_fmt(qtd * custo)}')
+
+                    if r.random() < 0.02:
+                        pagina += 1
+                        out += ['"ALCLIMA"'] + _cabecalho(periodo, data, pagina)
+
+                out.append(
+                    f'"Total do Tipo de Produto:",{_fmt(qtd_total)},'
+                    f'{_fmt(consumo_total / qtd_total)},{_fmt(consumo_total)}'
+                )
+
+    out.append('"ALCLIMA"')
+
+    return "\n".join(out) + "\n"
@@ -0,0 +1,45 @@
+# ============================================================
+# prisma — Núcleo do Protocolo Prisma (leitura e consolidação dos .txt Sishop)
+# Sem efeitos de interface; os submódulos são importados só quando usados
+# (import prisma.parser não carrega pyarrow, xlsxwriter etc.)
+# ============================================================
+
+import importlib
+
+# {nome público: submódulo}
+_EXPORTS = {
+    "ParseCache": "prisma.cache",
+    "RECORD_FIELDS": "prisma.parser",
+    "apply_depara": "prisma.depara",
+    "build_cube": "prisma.pipeline",
+    "consolidate": "prisma.pipeline",
+    "count_unique_patients": "prisma.pipeline",
+    "iter_records": "prisma.parser",
+    "load_cube": "prisma.historico",
+    "load_depara": "prisma.depara",
+    "load_history": "prisma.historico",
+    "process_multiple_texts": "prisma.parser",
+    "process_txt_content": "prisma.parser",
+    "process_txt_file": "prisma.parser",
+    "process_txt_file_chunked": "prisma.parser",
+    "select_files": "prisma.pipeline",
+    "upsert_history": "prisma.historico",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'prisma' has no attribute {name!r}")
+
+    valor = getattr(importlib.import_module(_EXPORTS[name]), name)
+
+    globals()[name] = valor
+
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,209 @@
+# ============================================================
+# prisma/cache.py — Cache de leitura por conteúdo do arquivo
+# Reenvio do mesmo .txt (mesmos bytes) não passa de novo pelo parser
+# ============================================================
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from prisma.parser import NOISE_MARKERS, PARSER_VERSION
+
+# Número de arquivos mantidos em memória
+CACHE_MAX_ENTRIES = 64
+
+# Número de Parquets mantidos em disco (os usados há mais tempo são apagados)
+CACHE_MAX_DISK_ENTRIES = 512
+
+# Tamanho do bloco lido para calcular o hash
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_digest(fileobj) -> str:
+    """
+    Hash SHA-256 do conteúdo do arquivo (lido em blocos, voltando ao início).
+    """
+
+    h = hashlib.sha256()
+
+    fileobj.seek(0)
+
+    while True:
+
+        chunk = fileobj.read(HASH_CHUNK_SIZE)
+
+        if not chunk:
+            break
+
+        h.update(chunk if isinstance(chunk, bytes) else chunk.encode("utf-8"))
+
+    fileobj.seek(0)
+
+    return h.hexdigest()
+
+
+def parse_cache_key(info, classificador=None) -> str:
+    """
+    Chave de cache de um dict de arquivo {'file' ou 'text'}: versão do parser + hash
+    (+ hash dos marcadores de ruído, se não forem os padrão).
+    """
+
+    if "file" in info:
+        digest = file_digest(info["file"])
+    else:
+        digest = hashlib.sha256(info["text"].encode("utf-8")).hexdigest()
+
+    chave = f"v{PARSER_VERSION}-{digest}"
+
+    if classificador is not None and classificador.noise_markers != NOISE_MARKERS:
+        marcadores = "\n".join(classificador.noise_markers).encode("utf-8")
+        chave += f"-r{hashlib.sha256(marcadores).hexdigest()[:16]}"
+
+    return chave
+
+
+class ParseCache:
+    """
+    Cache LRU de DataFrames já processados, por chave de conteúdo.
+    Com cache_dir, cada entrada também é gravada em Parquet e recarregada
+    de lá quando não está em memória; o disco guarda no máximo
+    max_disk_entries arquivos (LRU pela data de modificação).
+    Uma instância pode ser usada por várias threads (sessões do Streamlit).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        cache_dir: str = None,
+        max_disk_entries: int = CACHE_MAX_DISK_ENTRIES
+    ):
+
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, info, classificador=None) -> str:
+        return parse_cache_key(info, classificador)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key: str):
+
+        with self._lock:
+
+            df = self._entries.get(key)
+
+            if df is not None:
+
+                self._entries.move_to_end(key)
+                self.hits += 1
+
+                return df
+
+        # leitura do disco fora do lock: não bloqueia as outras sessões
+        if self.cache_dir and os.path.exists(self._path(key)):
+
+            try:
+                df = pd.read_parquet(self._path(key))
+                os.utime(self._path(key))
+            except Exception:
+                df = None
+
+        with self._lock:
+
+            if df is not None:
+                self._store(key, df)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return df
+
+    def put(self, key: str, df: pd.DataFrame):
+
+        with self._lock:
+            self._store(key, df)
+
+        if self.cache_dir:
+
+            # temporário único por processo/thread e renomeado: nunca deixa um Parquet pela metade
+            tmp = f"{self._path(key)}.tmp-{os.getpid()}-{threading.get_ident()}"
+
+            try:
+                df.to_parquet(tmp, index=False)
+                os.replace(tmp, self._path(key))
+            except Exception:
+                pass
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+            self._prune_disk()
+
+    def _store(self, key: str, df: pd.DataFrame):
+
+        # chamado com self._lock
+        self._entries[key] = df
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        """
+        Apaga os Parquets usados há mais tempo além de max_disk_entries.
+        """
+
+        with self._lock:
+
+            arquivos = []
+
+            for entrada in os.scandir(self.cache_dir):
+
+                if entrada.name.endswith(".parquet"):
+
+                    try:
+                        arquivos.append((entrada.stat().st_mtime, entrada.path))
+                    except FileNotFoundError:
+                        pass
+
+            if len(arquivos) <= self.max_disk_entries:
+                return
+
+            arquivos.sort()
+
+            for _, caminho in arquivos[:len(arquivos) - self.max_disk_entries]:
+
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+
+        with self._lock:
+
+            self._entries.clear()
+
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+
+                for nome in os.listdir(self.cache_dir):
+
+                    if nome.endswith(".parquet"):
+                        os.remove(os.path.join(self.cache_dir, nome))
+
+    def __len__(self):
+        return len(self._entries)
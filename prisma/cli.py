@@ -0,0 +1,353 @@
+# ============================================================
+# prisma/cli.py — Conversão em lote, sem interface (python -m prisma)
+# Mesmas regras do app: um arquivo por mês, DE PARA SETOR,
+# Cont. Pac.&Setor Unico, memória histórica opcional e exportação
+# ============================================================
+
+import argparse
+import glob
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from prisma.cache import ParseCache
+from prisma.excel import write_excel
+from prisma.export import EXPORT_FORMATS, export_bytes
+from prisma.historico import history_months, load_history, upsert_history
+from prisma.parser import NOISE_MARKERS, LineClassifier
+from prisma.pipeline import (
+    consolidate,
+    latest_label,
+    scan_file,
+    select_files,
+    summary_table,
+    volume_by_setor,
+)
+
+# {opção --formato: formato de prisma.export} (xlsx é tratado à parte)
+CLI_FORMATS = {
+    "xlsx": None,
+    "parquet": "Parquet",
+    "csv.gz": "CSV.gz",
+    "arrow": "Arrow IPC",
+}
+
+
+def expand_inputs(entradas: list) -> list:
+    """
+    Diretórios (todos os .txt dentro) e padrões glob → lista de arquivos
+    sem repetição, na ordem em que foram informados.
+    """
+
+    arquivos = []
+
+    for entrada in entradas:
+
+        if os.path.isdir(entrada):
+            encontrados = sorted(
+                os.path.join(entrada, n)
+                for n in os.listdir(entrada)
+                if n.lower().endswith(".txt")
+            )
+        else:
+            encontrados = sorted(glob.glob(entrada)) or (
+                [entrada] if os.path.isfile(entrada) else []
+            )
+
+        for caminho in encontrados:
+
+            if caminho not in arquivos:
+                arquivos.append(caminho)
+
+    return arquivos
+
+
+def _opcao_mes(texto: str):
+    """
+    Valor de --mes validado na leitura dos argumentos (antes de ler qualquer arquivo):
+    'recente', 'todos' ou o primeiro dia do mês AAAA-MM.
+    """
+
+    if texto in ("recente", "todos"):
+        return texto
+
+    try:
+        return pd.Timestamp(datetime.strptime(texto, "%Y-%m"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto} (use recente, todos ou AAAA-MM)")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+
+    parser = argparse.ArgumentParser(
+        prog="prisma",
+        description="Converte relatórios Sishop (.txt) no consolidado do Protocolo Prisma."
+    )
+
+    parser.add_argument(
+        "entradas",
+        nargs="+",
+        help="diretórios ou padrões glob com os .txt (ex.: 'exports/*.txt')"
+    )
+
+    parser.add_argument(
+        "-o", "--saida",
+        default=".",
+        help="diretório dos arquivos gerados (padrão: diretório atual)"
+    )
+
+    parser.add_argument(
+        "-f", "--formato",
+        action="append",
+        choices=list(CLI_FORMATS),
+        help="formato de saída; pode repetir (padrão: xlsx)"
+    )
+
+    parser.add_argument(
+        "--mes",
+        type=_opcao_mes,
+        default="recente",
+        help="'recente' (padrão, como no app), 'todos' ou um mês AAAA-MM"
+    )
+
+    parser.add_argument(
+        "--depara",
+        default="DE PARA SETOR.xlsx",
+        help="planilha DE PARA SETOR (ignorada se não existir)"
+    )
+
+    parser.add_argument(
+        "--historico",
+        default=None,
+        help="diretório da memória histórica a atualizar (ex.: prisma_historico)"
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="diretório do cache de leitura (Parquet por conteúdo do arquivo)"
+    )
+
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=0,
+        help="processos para a leitura (0 = sequencial)"
+    )
+
+    parser.add_argument(
+        "--esquema-compacto",
+        action="store_true",
+        help="categóricos / float32 / datas no consolidado"
+    )
+
+    parser.add_argument(
+        "--ruido",
+        action="append",
+        default=[],
+        metavar="TEXTO",
+        help="texto que marca linhas de cabeçalho/rodapé a ignorar, além de "
+             f"{', '.join(NOISE_MARKERS)}; pode repetir"
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="modo contínuo: observa as entradas e processa cada .txt novo ou alterado "
+             "(exige --historico)"
+    )
+
+    parser.add_argument(
+        "--intervalo",
+        type=float,
+        default=5.0,
+        help="segundos entre varreduras no modo --watch (padrão: 5)"
+    )
+
+    return parser
+
+
+def _classificador(args):
+    return LineClassifier(NOISE_MARKERS + tuple(args.ruido)) if args.ruido else None
+
+
+def _watch(args, formatos: list) -> int:
+
+    # importado aqui: prisma.watch usa funções deste módulo
+    from prisma.watch import FolderWatcher
+
+    if not args.historico:
+        print("prisma: --watch exige --historico", file=sys.stderr)
+        return 2
+
+    watcher = FolderWatcher(
+        args.entradas,
+        historico=args.historico,
+        saida=args.saida,
+        formatos=formatos,
+        depara_path=args.depara,
+        cache_dir=args.cache_dir,
+        compact=args.esquema_compacto,
+        classificador=_classificador(args),
+        intervalo=args.intervalo,
+        log=lambda msg: print(msg, flush=True)
+    )
+
+    print(f"observando: {', '.join(args.entradas)} (Ctrl+C para sair)", flush=True)
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+    return 0
+
+
+def _meses_exportar(opcao, df: pd.DataFrame, meses_hist: list) -> list:
+
+    if opcao == "recente":
+        label = latest_label(df)
+        return [] if label is None else [pd.Timestamp(label)]
+
+    meses = sorted(set(pd.to_datetime(df["Período Label"].dropna().unique())))
+
+    if opcao == "todos":
+        return meses
+
+    if opcao not in meses and opcao not in meses_hist:
+        raise SystemExit(f"prisma: mês {opcao:%Y-%m} não encontrado nos arquivos nem no histórico")
+
+    return [opcao]
+
+
+def write_outputs(df_consolidado: pd.DataFrame, saida: str, formatos: list) -> list:
+    """
+    Grava consolidado + resumo do mês em cada formato. Retorna os caminhos.
+    """
+
+    df_resumo = summary_table(volume_by_setor(df_consolidado))
+
+    periodo_nome = pd.to_datetime(df_consolidado.iloc[0]["Período Label"]).strftime("%Y_%m")
+
+    gerados = []
+
+    for formato in formatos:
+
+        if formato == "xlsx":
+
+            caminho = os.path.join(saida, f"Prot_Prisma_{periodo_nome}.xlsx")
+
+            write_excel(
+                {"Protocolo Prisma": df_consolidado, "Resumo": df_resumo},
+                caminho,
+                column_formats={"Período Label": "DD/MMM/YY"}
+            )
+
+            gerados.append(caminho)
+
+            continue
+
+        extensao = EXPORT_FORMATS[CLI_FORMATS[formato]][0]
+
+        for nome, dados in (
+            (f"Prot_Prisma_{periodo_nome}", df_consolidado),
+            (f"Prot_Prisma_Resumo_{periodo_nome}", df_resumo),
+        ):
+
+            caminho = os.path.join(saida, f"{nome}{extensao}")
+
+            with open(caminho, "wb") as f:
+                f.write(export_bytes(dados, CLI_FORMATS[formato]))
+
+            gerados.append(caminho)
+
+    return gerados
+
+
+def main(argv=None) -> int:
+
+    args = _build_parser().parse_args(argv)
+
+    formatos = args.formato or ["xlsx"]
+
+    if args.watch:
+        return _watch(args, formatos)
+
+    arquivos = expand_inputs(args.entradas)
+
+    if not arquivos:
+        print("prisma: nenhum arquivo .txt encontrado", file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+
+    abertos = [open(caminho, "rb") for caminho in arquivos]
+
+    try:
+
+        file_infos = [
+            scan_file(f, os.path.basename(caminho), seq)
+            for seq, (caminho, f) in enumerate(zip(arquivos, abertos), start=1)
+        ]
+
+        kept_infos, discarded_infos = select_files(file_infos)
+
+        for r in discarded_infos:
+            print(f"descartado: {r['name']} — Período: {r['period']} (mês repetido)")
+
+        cache = ParseCache(cache_dir=args.cache_dir) if args.cache_dir else None
+
+        df = consolidate(
+            kept_infos,
+            depara_path=args.depara,
+            workers=args.workers,
+            cache=cache,
+            compact=args.esquema_compacto,
+            classificador=_classificador(args)
+        )
+
+    finally:
+        for f in abertos:
+            f.close()
+
+    for r in kept_infos:
+
+        registros = f"{r['registros']:,}".replace(",", ".")
+        segundos = f"{r['tempo_parse']:.2f}".replace(".", ",")
+
+        print(f"lido: {r['name']} ({r['encoding'] or 'ASCII'}) — {registros} registros em {segundos} s")
+
+    if df.empty:
+        print("prisma: nenhum registro encontrado nos arquivos", file=sys.stderr)
+        return 1
+
+    meses_hist = []
+
+    if args.historico:
+
+        resultado = upsert_history(df, args.historico)
+
+        for label in resultado["mantidos"]:
+            print(f"histórico: mantido {label:%m/%Y} (período mais completo já gravado)")
+
+        meses_hist = history_months(args.historico)
+
+    os.makedirs(args.saida, exist_ok=True)
+
+    for mes in _meses_exportar(args.mes, df, meses_hist):
+
+        # como no app, o histórico guarda a versão vencedora do mês
+        if mes in meses_hist:
+            df_consolidado = load_history(args.historico, meses=[mes], compact=args.esquema_compacto)
+        else:
+            df_consolidado = df[df["Período Label"] == mes].copy()
+
+        for caminho in write_outputs(df_consolidado, args.saida, formatos):
+            print(f"gerado: {caminho}")
+
+    print(f"concluído em {time.perf_counter() - t0:.1f} s")
+
+    return 0
@@ -0,0 +1,131 @@
+# ============================================================
+# prisma/depara.py — DE PARA SETOR (Setor → Setor Agrupado)
+# A planilha é lida uma vez e guardada como dict; só é relida quando
+# o arquivo muda em disco (mtime/tamanho e, se mudaram, hash do conteúdo)
+# ============================================================
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Valor de "Setor Agrupado" para setores ausentes da planilha
+SETOR_SEM_ASSOCIACAO = "*SOLICITAR ASSOCIAÇÃO DE SETOR*"
+
+# {caminho: {"assinatura": (mtime_ns, tamanho), "hash": sha256, "mapa": dict}}
+_CACHE = {}
+_LOCK = threading.Lock()
+
+
+def _file_sha256(path: str) -> str:
+
+    h = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def read_depara(path: str) -> dict:
+    """
+    Lê a planilha: 1ª coluna = Setor, 2ª coluna = Setor Agrupado.
+    Setor repetido fica com a primeira linha. Retorna None se houver menos de 2 colunas.
+    """
+
+    df_depara = pd.read_excel(path, header=0)
+
+    df_depara.columns = df_depara.columns.str.strip()
+
+    if len(df_depara.columns) < 2:
+        return None
+
+    de = df_depara.iloc[:, 0]
+    para = df_depara.iloc[:, 1]
+
+    primeira = ~de.duplicated(keep="first")
+
+    return dict(zip(de[primeira], para[primeira]))
+
+
+def depara_signature(path: str):
+    """
+    (mtime_ns, tamanho) da planilha, ou None se não existir: muda quando o arquivo muda.
+    """
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_depara(path: str):
+    """
+    DE PARA em cache. A cada chamada só o stat do arquivo é consultado;
+    a planilha é relida quando o conteúdo mudou (recarga automática).
+    Retorna None se o arquivo não existir ou não tiver as 2 colunas.
+    """
+
+    assinatura = depara_signature(path)
+
+    if assinatura is None:
+        return None
+
+    with _LOCK:
+
+        entrada = _CACHE.get(path)
+
+        if entrada is not None and entrada["assinatura"] == assinatura:
+            return entrada["mapa"]
+
+        digest = _file_sha256(path)
+
+        # arquivo regravado com o mesmo conteúdo: não relê o Excel
+        if entrada is not None and entrada["hash"] == digest:
+            entrada["assinatura"] = assinatura
+            return entrada["mapa"]
+
+        mapa = read_depara(path)
+
+        _CACHE[path] = {"assinatura": assinatura, "hash": digest, "mapa": mapa}
+
+        return mapa
+
+
+def map_setor_agrupado(setores: pd.Series, mapa: dict) -> pd.Series:
+    """
+    Setor Agrupado de cada linha: um lookup no dict por Setor distinto,
+    espalhado para as linhas pelos códigos do factorize.
+    """
+
+    codes, uniques = pd.factorize(setores)
+
+    agrupado = np.empty(len(uniques) + 1, dtype=object)
+    agrupado[:-1] = [mapa.get(u, np.nan) for u in uniques]
+    agrupado[-1] = np.nan
+
+    return pd.Series(agrupado[codes], index=setores.index).fillna(SETOR_SEM_ASSOCIACAO)
+
+
+def apply_depara(df: pd.DataFrame, mapa: dict) -> pd.DataFrame:
+    """
+    Insere "Setor Agrupado" logo após "Setor" (no próprio df).
+    """
+
+    df.insert(
+        df.columns.get_loc("Setor") + 1,
+        "Setor Agrupado",
+        map_setor_agrupado(df["Setor"], mapa)
+    )
+
+    return df
+
+
+def clear_depara_cache():
+    with _LOCK:
+        _CACHE.clear()
@@ -0,0 +1,151 @@
+# ============================================================
+# prisma/excel.py — Exportação Excel (xlsxwriter, memória constante)
+# Linhas gravadas em sequência direto no arquivo; formatos de número/data
+# definidos por coluna na gravação (sem percorrer células depois)
+# ============================================================
+
+import os
+import tempfile
+
+import pandas as pd
+import xlsxwriter
+
+from prisma.schema import float32_to_float64
+
+# Origem das datas seriais do Excel (sistema 1900)
+EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+
+# Datas (datetime.date, como Per_Inicio / Per_Fim): padrão do pd.ExcelWriter usado antes.
+# Colunas datetime64 (Entrada / Alta no esquema compacto, que antes eram texto
+# dd/mm/aaaa) seguem o mesmo layout do texto em vez do "YYYY-MM-DD HH:MM:SS" do pandas
+DATETIME_FORMAT = "DD/MM/YYYY"
+DATE_FORMAT = "YYYY-MM-DD"
+
+# Cabeçalho no estilo do pandas.to_excel
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+def _excel_serial(s: pd.Series) -> list:
+    """
+    Datas como número serial do Excel (vetorizado); nulos viram None.
+    """
+
+    serial = (pd.to_datetime(s, errors="coerce") - EXCEL_EPOCH) / pd.Timedelta(days=1)
+
+    return serial.astype(object).where(serial.notna(), None).tolist()
+
+
+def _column_values(s: pd.Series, date_format: str, datetime_format: str):
+    """
+    (valores da coluna como tipos Python, formato de número da coluna ou None).
+    """
+
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(object)
+
+    # esquema compacto: o valor do relatório, sem o ruído do float32
+    if s.dtype == "float32":
+        s = float32_to_float64(s)
+
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return _excel_serial(s), datetime_format
+
+    if s.dtype == object:
+
+        tipo = pd.api.types.infer_dtype(s, skipna=True)
+
+        if tipo == "date":
+            return _excel_serial(s), date_format
+
+        if tipo == "datetime":
+            return _excel_serial(s), datetime_format
+
+    return s.astype(object).where(s.notna(), None).tolist(), None
+
+
+def write_excel(
+    sheets: dict,
+    path: str,
+    column_formats: dict = None,
+    datetime_format: str = DATETIME_FORMAT,
+    date_format: str = DATE_FORMAT
+):
+    """
+    Grava {nome da aba: DataFrame} em path (sem índice).
+    column_formats = {nome da coluna: formato} substitui o formato padrão
+    daquela coluna em todas as abas (ex.: {"Período Label": "DD/MMM/YY"}).
+    """
+
+    column_formats = column_formats or {}
+
+    workbook = xlsxwriter.Workbook(
+        path,
+        {
+            "constant_memory": True,
+            "strings_to_urls": False,
+            "nan_inf_to_errors": True,
+            "default_date_format": date_format,
+        }
+    )
+
+    formatos = {}
+
+    def formato(padrao):
+
+        if padrao is None:
+            return None
+
+        if padrao not in formatos:
+            formatos[padrao] = workbook.add_format({"num_format": padrao})
+
+        return formatos[padrao]
+
+    cabecalho = workbook.add_format(HEADER_FORMAT)
+
+    try:
+
+        for nome, df in sheets.items():
+
+            ws = workbook.add_worksheet(nome)
+
+            colunas = []
+
+            for j, c in enumerate(df.columns):
+
+                valores, padrao = _column_values(df[c], date_format, datetime_format)
+
+                padrao = column_formats.get(c, padrao)
+
+                # formato da coluna: vale para todas as células gravadas sem formato
+                if padrao is not None:
+                    ws.set_column(j, j, None, formato(padrao))
+
+                colunas.append(valores)
+
+            ws.write_row(0, 0, [str(c) for c in df.columns], cabecalho)
+
+            for i, linha in enumerate(zip(*colunas), start=1):
+                ws.write_row(i, 0, linha)
+
+    finally:
+        workbook.close()
+
+
+def excel_bytes(sheets: dict, **kwargs) -> bytes:
+    """
+    write_excel em arquivo temporário (o modo de memória constante exige arquivo)
+    e retorna o conteúdo do .xlsx.
+    """
+
+    fd, tmp = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+
+    try:
+
+        write_excel(sheets, tmp, **kwargs)
+
+        with open(tmp, "rb") as f:
+            return f.read()
+
+    finally:
+        os.remove(tmp)
@@ -0,0 +1,82 @@
+# ============================================================
+# prisma/export.py — Exportações compactas (Parquet, CSV.gz, Arrow IPC)
+# Os três formatos saem da mesma tabela Arrow (mesmo esquema de colunas)
+# ============================================================
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from prisma.schema import float32_to_float64
+
+# {formato: (extensão, MIME)}
+EXPORT_FORMATS = {
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "CSV.gz": (".csv.gz", "application/gzip"),
+    "Arrow IPC": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+# Compressão dos blocos do Arrow IPC (lida por pyarrow/polars/DuckDB)
+ARROW_COMPRESSION = "zstd"
+
+
+def to_arrow_table(df: pd.DataFrame) -> pa.Table:
+
+    # esquema compacto: float32 volta ao float64 exato do relatório (27.33, não 27.3299999)
+    float32 = [c for c in df.columns if df[c].dtype == "float32"]
+
+    if float32:
+        df = df.assign(**{c: float32_to_float64(df[c]) for c in float32})
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _decode_dictionaries(table: pa.Table) -> pa.Table:
+    """
+    Colunas categóricas (dictionary) como valores simples, para o CSV.
+    """
+
+    for i, campo in enumerate(table.schema):
+
+        if pa.types.is_dictionary(campo.type):
+
+            table = table.set_column(
+                i,
+                campo.name,
+                table.column(i).cast(campo.type.value_type)
+            )
+
+    return table
+
+
+def export_bytes(df: pd.DataFrame, formato: str) -> bytes:
+    """
+    df no formato pedido (uma das chaves de EXPORT_FORMATS).
+    """
+
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    table = to_arrow_table(df)
+
+    buffer = pa.BufferOutputStream()
+
+    if formato == "Parquet":
+
+        pq.write_table(table, buffer)
+
+    elif formato == "CSV.gz":
+
+        with pa.CompressedOutputStream(buffer, "gzip") as saida:
+            pa_csv.write_csv(_decode_dictionaries(table), saida)
+
+    else:
+
+        opcoes = pa_ipc.IpcWriteOptions(compression=ARROW_COMPRESSION)
+
+        with pa_ipc.new_file(buffer, table.schema, options=opcoes) as writer:
+            writer.write_table(table)
+
+    return buffer.getvalue().to_pybytes()
@@ -0,0 +1,322 @@
+# ============================================================
+# prisma/historico.py — Memória histórica mensal (prisma_historico/)
+# Uma partição Parquet por mês ("Período Label"): mes=AAAA-MM/part-0.parquet
+# Cada upload substitui apenas a(s) partição(ões) do(s) seu(s) mês(es)
+# Ao lado de cada partição fica o cubo do mês (_cube.parquet, ver build_cube)
+# Todas as partições são gravadas no esquema padrão (canonical_schema)
+# ============================================================
+
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from prisma.pipeline import CUBE_PATIENT_COLUMNS, build_cube
+from prisma.schema import canonical_schema, compact_schema
+
+# Sessões do Streamlit compartilham o processo: uma gravação por vez
+_LOCK = threading.Lock()
+
+PARTITION_PREFIX = "mes="
+PARTITION_FILE = "part-0.parquet"
+
+# Prefixo "_": leitores de dataset (pyarrow, DuckDB, Spark) ignoram o arquivo
+# e não misturam o cubo com as linhas de detalhe de prisma_historico/
+CUBE_FILE = "_cube.parquet"
+
+# Nome usado antes do prefixo: apagado quando encontrado (o cubo é refeito)
+LEGACY_CUBE_FILE = "cube.parquet"
+
+
+def partition_dir(path: str, label) -> str:
+    return os.path.join(path, f"{PARTITION_PREFIX}{pd.Timestamp(label):%Y-%m}")
+
+
+def _partitions(path: str) -> dict:
+    """
+    {Período Label: arquivo Parquet} das partições existentes (sem ler dados).
+    """
+
+    if not os.path.isdir(path):
+        return {}
+
+    parts = {}
+
+    for nome in os.listdir(path):
+
+        arquivo = os.path.join(path, nome, PARTITION_FILE)
+
+        if not nome.startswith(PARTITION_PREFIX) or not os.path.exists(arquivo):
+            continue
+
+        try:
+            label = pd.Timestamp(f"{nome[len(PARTITION_PREFIX):]}-01")
+        except ValueError:
+            continue
+
+        parts[label] = arquivo
+
+    return dict(sorted(parts.items()))
+
+
+def _selected(parts: dict, meses=None, inicio=None, fim=None) -> dict:
+    """
+    Partições dos meses pedidos ('inicio'/'fim' inclusive).
+    """
+
+    if meses is not None:
+        meses = {pd.Timestamp(m) for m in meses}
+
+    if inicio is not None:
+        inicio = pd.Timestamp(inicio).replace(day=1)
+
+    if fim is not None:
+        fim = pd.Timestamp(fim)
+
+    return {
+        label: arquivo
+        for label, arquivo in parts.items()
+        if (meses is None or label in meses)
+        and (inicio is None or label >= inicio)
+        and (fim is None or label <= fim)
+    }
+
+
+def partition_mtime(path: str, label):
+    """
+    mtime_ns da partição do mês (None se não existir): muda a cada regravação.
+    """
+
+    try:
+        return os.stat(os.path.join(partition_dir(path, label), PARTITION_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _fim_por_mes(df: pd.DataFrame) -> pd.Series:
+    """
+    Maior data de fim de período de cada mês (NaT quando não houver).
+    """
+
+    return (
+        pd.to_datetime(df["Per_Fim"], errors="coerce")
+        .groupby(df["Período Label"])
+        .max()
+    )
+
+
+def _write_atomic(df: pd.DataFrame, path: str):
+    """
+    Grava em arquivo temporário no mesmo diretório e renomeia:
+    uma falha no meio da gravação nunca corrompe a partição existente.
+    """
+
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _cube_current(cubo: str) -> bool:
+    """
+    O cubo existe e tem as contagens de pacientes por dimensão
+    (cubos gravados antes delas são refeitos da partição).
+    """
+
+    try:
+        nomes = pq.read_schema(cubo).names
+    except FileNotFoundError:
+        return False
+
+    return all(c in nomes for c in CUBE_PATIENT_COLUMNS.values())
+
+
+def _remove_legacy_cube(destino: str):
+
+    legado = os.path.join(destino, LEGACY_CUBE_FILE)
+
+    if os.path.exists(legado):
+        os.remove(legado)
+
+
+def load_history(
+    path: str,
+    meses=None,
+    inicio=None,
+    fim=None,
+    setores=None,
+    coluna_setor: str = "Setor Agrupado",
+    columns=None,
+    compact: bool = False
+) -> pd.DataFrame:
+    """
+    Lê a memória histórica lendo só as partições (meses), colunas e setores pedidos.
+    'inicio'/'fim' delimitam os meses (inclusive); 'setores' filtra coluna_setor
+    (ou "Setor", se a partição não tiver coluna_setor).
+    As partições voltam no esquema padrão (compact=True aplica compact_schema).
+    Retorna DataFrame vazio se não existir.
+    """
+
+    parts = _selected(_partitions(path), meses, inicio, fim)
+
+    frames = []
+
+    for arquivo in parts.values():
+
+        nomes = pq.read_schema(arquivo).names
+
+        cols = None if columns is None else [c for c in columns if c in nomes]
+
+        filtros = None
+
+        if setores is not None:
+
+            col = coluna_setor if coluna_setor in nomes else "Setor"
+
+            filtros = [(col, "in", list(setores))]
+
+        # partições gravadas antes do esquema único também voltam no padrão
+        frames.append(canonical_schema(pd.read_parquet(arquivo, columns=cols, filters=filtros)))
+
+    if not frames:
+        return pd.DataFrame(columns=columns) if columns is not None else pd.DataFrame()
+
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    return compact_schema(df) if compact else df
+
+
+def load_cube(path: str, meses=None, inicio=None, fim=None) -> pd.DataFrame:
+    """
+    Lê o cubo mensal (build_cube) dos meses pedidos, sem ler as linhas de detalhe.
+    Partições gravadas antes do cubo existir (ou com um cubo sem as colunas atuais)
+    têm o cubo gerado e gravado na primeira leitura.
+    Retorna DataFrame vazio se não houver meses.
+    """
+
+    frames = []
+
+    for label, arquivo in _selected(_partitions(path), meses, inicio, fim).items():
+
+        cubo = os.path.join(os.path.dirname(arquivo), CUBE_FILE)
+
+        if not _cube_current(cubo):
+
+            with _LOCK:
+
+                if not _cube_current(cubo):
+                    _remove_legacy_cube(os.path.dirname(arquivo))
+                    _write_atomic(build_cube(pd.read_parquet(arquivo)), cubo)
+
+        frames.append(pd.read_parquet(cubo))
+
+    if not frames:
+        return pd.DataFrame()
+
+    if len(frames) == 1:
+        return frames[0]
+
+    return pd.concat(frames, ignore_index=True)
+
+
+def history_months(path: str) -> list:
+    """
+    Meses (Período Label) presentes na memória histórica, em ordem.
+    """
+
+    return list(_partitions(path))
+
+
+def upsert_history(df: pd.DataFrame, path: str) -> dict:
+    """
+    Grava na memória histórica os meses presentes em df, reescrevendo apenas
+    a partição de cada um desses meses.
+    Regra do "último do mês": um mês já gravado só é substituído se o novo período
+    termina na mesma data ou depois (Per_Fim).
+    Retorna {'gravados': [...], 'mantidos': [...]} com os Período Label.
+    """
+
+    # esquema único: um mês gravado com o esquema compacto não difere dos outros
+    novos = canonical_schema(df[df["Período Label"].notna()])
+
+    if novos.empty:
+        return {"gravados": [], "mantidos": []}
+
+    gravados = []
+    mantidos = []
+
+    with _LOCK:
+
+        os.makedirs(path, exist_ok=True)
+
+        parts = _partitions(path)
+
+        for label, df_mes in novos.groupby("Período Label", sort=True):
+
+            fim_novo = _fim_por_mes(df_mes).get(label)
+
+            if label in parts:
+
+                fim_hist = _fim_por_mes(
+                    pd.read_parquet(parts[label], columns=["Período Label", "Per_Fim"])
+                ).get(label)
+
+                if pd.notna(fim_hist) and (pd.isna(fim_novo) or fim_hist > fim_novo):
+                    mantidos.append(label)
+                    continue
+
+            destino = partition_dir(path, label)
+
+            os.makedirs(destino, exist_ok=True)
+
+            cubo = os.path.join(destino, CUBE_FILE)
+
+            # sem cubo durante a troca: se a gravação falhar, load_cube o refaz da partição
+            if os.path.exists(cubo):
+                os.remove(cubo)
+
+            _remove_legacy_cube(destino)
+
+            _write_atomic(df_mes.reset_index(drop=True), os.path.join(destino, PARTITION_FILE))
+            _write_atomic(build_cube(df_mes), cubo)
+
+            gravados.append(label)
+
+    return {"gravados": gravados, "mantidos": mantidos}
+
+
+def migrate_legacy_history(path: str, legacy_path: str) -> bool:
+    """
+    Converte a memória histórica antiga (um único Parquet) para o formato
+    particionado por mês e remove o arquivo antigo.
+    """
+
+    if not os.path.exists(legacy_path):
+        return False
+
+    upsert_history(pd.read_parquet(legacy_path), path)
+
+    os.remove(legacy_path)
+
+    return True
+
+
+def clear_history(path: str) -> bool:
+    """
+    Apaga a memória histórica. Retorna False se ela não existia.
+    """
+
+    with _LOCK:
+
+        if not os.path.isdir(path):
+            return False
+
+        shutil.rmtree(path)
+
+        return True
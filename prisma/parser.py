@@ -0,0 +1,1249 @@
+# ============================================================
+# prisma/parser.py — Núcleo de leitura dos .txt de Consumo Normal (Sishop)
+# Sem dependência de interface: importável pelo app e por processos de trabalho
+# ============================================================
+
+import csv
+import codecs
+import itertools
+import re
+import io
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, date
+
+import numpy as np
+import pandas as pd
+
+# ----------------------- Funções auxiliares -----------------------
+
+
+# Versão da saída do parser (entra na chave do cache: mudar ao alterar o resultado)
+PARSER_VERSION = 3
+
+# Linhas de cabeçalho/rodapé de página do Sishop que devem ser ignoradas
+NOISE_MARKERS = ("AMERICAS MEDICAL CITY", "ALCLIMA")
+
+PERIODO_RE = re.compile(
+    r'[",]*Per[ií]odo\s*:[" ,]*([0-3]?\d/[0-1]?\d/\d{4})\s*a\s*([0-3]?\d/[0-1]?\d/\d{4})'
+)
+
+PLANO_RE = re.compile(r'Plano\s*:\s*"?([^"]*?)"?$')
+
+# Linha 'Paciente:' no layout padrão (um campo entre aspas, sem aspas dentro):
+# id - nome, Entrada, Alta, Convênio e Plano numa única busca
+PACIENTE_RE = re.compile(
+    r'Paciente:,"([^"]*?)  Entrada: ([^"]*?)  Alta: ([^"]*?)  Convênio: ([^"]*?)  Plano: ([^"]*)"'
+)
+
+# Tipos de linha (bits de LineClassifier.classify; uma linha pode ter mais de um)
+LINHA_RUIDO = 1
+LINHA_TOTAL = 2
+LINHA_PERIODO = 4
+LINHA_TIPO = 8
+LINHA_PACIENTE = 16
+LINHA_SETOR = 32
+
+# Marcadores procurados em qualquer posição da linha
+MARCADOR_TOTAL = "Total do Tipo de Produto:"
+MARCADOR_PERIODO = "Período"
+
+# {prefixo da linha: tipo} (os três primeiros caracteres já distinguem os prefixos)
+PREFIXOS_LINHA = {
+    '"Tipo de Produto:"': LINHA_TIPO,
+    "Paciente:": LINHA_PACIENTE,
+    "Setor:": LINHA_SETOR,
+}
+
+# Caracteres de quebra de linha reconhecidos por str.splitlines
+LINE_BREAKS = "\r\n\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+
+# Tamanho de cada bloco lido na triagem do upload (o cabeçalho cabe em um ou dois)
+HEADER_CHUNK_SIZE = 8 * 1024
+
+# Bytes sem caractere no cp1252: um arquivo com eles é lido como latin-1
+CP1252_UNDEFINED = (b"\x81", b"\x8d", b"\x8f", b"\x90", b"\x9d")
+
+# Limite de linhas lidas como cabeçalho antes do primeiro Setor/Paciente
+HEADER_MAX_LINES = 50
+
+DATA_RE = re.compile(r"Data:\s*,?\s*([0-3]?\d/[0-1]?\d/\d{4})")
+
+# 'Data:' no fim do texto lido, ainda sem a data: o \s* de DATA_RE atravessa
+# quebras de linha, então a data pode estar nas linhas seguintes
+DATA_PENDENTE_RE = re.compile(r"Data:\s*,?\s*\Z")
+
+# Campos de cada registro gerado por iter_records
+RECORD_FIELDS = (
+    "Extração Sishop",
+    "Período",
+    "Setor",
+    "Paciente",
+    "Entrada",
+    "Alta",
+    "Convênio",
+    "Plano",
+    "Tipo de Produto",
+    "Qtd. Total",
+    "Custo Atual",
+    "Consumo Total",
+)
+
+# Tamanho mínimo (em linhas) de cada bloco no processamento paralelo de um arquivo
+CHUNK_LINES = 50_000
+
+# Marca de "período ainda não conhecido" nos blocos processados em paralelo
+PERIODO_HERDADO = "\x00PERIODO_HERDADO"
+
+# Colunas do DataFrame de saída (por Paciente x Tipo de Produto)
+FRAME_COLUMNS = [
+    "Arquivo Origem",
+    "Upload Seq",
+    "Extração Sishop",
+
+    "Período",
+    "Período Label",
+
+    "Setor",
+
+    "Entrada",
+    "Alta",
+    "Convênio",
+    "Plano",
+
+    "Tipo de Produto",
+
+    "Qtd. Total",
+    "Custo Atual",
+    "Consumo Total",
+
+    "Registro",
+    "Nome do Paciente",
+]
+
+# Sem registros, a coluna Paciente não é dividida em Registro / Nome
+EMPTY_FRAME_COLUMNS = FRAME_COLUMNS[:6] + ["Paciente"] + FRAME_COLUMNS[6:-2]
+
+# Janela de busca do período ao redor da linha atual (2 antes, 4 depois)
+PERIODO_JANELA_ANTES = 2
+PERIODO_JANELA_DEPOIS = 4
+
+# Estados do parser: fora de paciente → dentro de paciente → dentro de tipo de produto
+ESTADO_FORA = 0
+ESTADO_PACIENTE = 1
+ESTADO_PRODUTO = 2
+
+
+def parse_number_us(s):
+    if s is None:
+        return None
+    s = str(s).strip().strip('"')
+    if s == "":
+        return None
+    s = s.replace(",", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def br_format(n):
+    if n is None or n == "":
+        return ""
+    s = f"{n:,.2f}"
+    return s.replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# Acima disso (ou muito perto de meio centavo) o cálculo em float pode divergir
+# do arredondamento de f"{n:.2f}": esses valores usam br_format
+BR_FORMAT_MAX_EXATO = 1e13
+BR_FORMAT_MEIO_CENTAVO = 1e-6
+
+
+def br_format_array(values) -> np.ndarray:
+    """
+    br_format de uma coluna inteira (1.234,56) com operações de numpy,
+    sem chamada Python por célula. Nulos viram "".
+    """
+
+    x = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype="float64")
+
+    if x.size == 0:
+        return np.empty(0, dtype=object)
+
+    nulo = np.isnan(x)
+
+    a = np.abs(np.where(nulo, 0.0, x))
+
+    centavos = a * 100
+
+    resto = centavos - np.floor(centavos)
+
+    lento = ~np.isfinite(a) | (a >= BR_FORMAT_MAX_EXATO) | (
+        np.abs(resto - 0.5) < BR_FORMAT_MEIO_CENTAVO
+    )
+
+    centavos = np.rint(np.where(lento, 0.0, centavos)).astype(np.int64)
+
+    inteiro = centavos // 100
+
+    # grupos de 3 dígitos completados com zeros; os zeros à esquerda saem no lstrip
+    grupos = max(1, len(str(int(inteiro.max(initial=0)))))
+    grupos = (grupos + 2) // 3
+
+    texto = np.strings.zfill((inteiro % 1000).astype(str), 3)
+
+    for k in range(1, grupos):
+
+        grupo = np.strings.zfill(((inteiro // 1000 ** k) % 1000).astype(str), 3)
+
+        texto = np.strings.add(np.strings.add(grupo, "."), texto)
+
+    texto = np.strings.lstrip(texto, "0.")
+
+    texto = np.where(texto == "", "0", texto)
+
+    texto = np.strings.add(
+        np.strings.add(np.where(np.signbit(x), "-", ""), texto),
+        np.strings.add(",", np.strings.zfill((centavos % 100).astype(str), 2))
+    ).astype(object)
+
+    for i in np.flatnonzero(lento & ~nulo):
+        texto[i] = br_format(float(x[i]))
+
+    texto[nulo] = ""
+
+    return texto
+
+
+def extract_between(text, start_label, end_label):
+    p = text.find(start_label)
+    if p == -1:
+        return ""
+    p += len(start_label)
+    q = text.find(end_label, p)
+    return text[p:q].strip() if q != -1 else text[p:].strip()
+
+
+def extract_plano(text):
+    m = PLANO_RE.search(text.strip())
+    if m and m.group(1):
+        return m.group(1).strip()
+    if "Plano:" in text:
+        return text.split("Plano:")[-1].strip().strip('"')
+    return ""
+
+
+def detect_periodo_first_lines(raw_text: str) -> str:
+    lines = raw_text.splitlines()[:5]
+    header = " ".join(lines)
+
+    m = PERIODO_RE.search(header)
+
+    return f"{m.group(1)} a {m.group(2)}" if m else ""
+
+
+# ============================================================
+# ALTERAÇÃO 1 — Período Label agora retorna DATA
+# ============================================================
+
+def periodo_label_br(periodo_str: str):
+    """
+    Converte 'dd/mm/yyyy a dd/mm/yyyy'
+    para data do primeiro dia do mês (01/mm/aa)
+    """
+
+    if not isinstance(periodo_str, str) or "a" not in periodo_str:
+        return None
+
+    inicio = periodo_str.split("a")[0].strip()
+
+    try:
+
+        d = pd.to_datetime(inicio, format="%d/%m/%Y", errors="coerce")
+
+        if pd.isna(d):
+            return None
+
+        return datetime(d.year, d.month, 1)
+
+    except Exception:
+        return None
+
+
+def parse_periodo_to_dates(periodo_str: str):
+
+    if not isinstance(periodo_str, str) or 'a' not in periodo_str:
+        return (None, None)
+
+    partes = periodo_str.split('a')
+
+    if len(partes) != 2:
+        return (None, None)
+
+    ini = partes[0].strip()
+    fim = partes[1].strip()
+
+    try:
+
+        dt_ini = datetime.strptime(ini, "%d/%m/%Y").date()
+        dt_fim = datetime.strptime(fim, "%d/%m/%Y").date()
+
+        return (dt_ini, dt_fim)
+
+    except Exception:
+        return (None, None)
+
+
+def periodo_key(lbl):
+
+    if pd.isna(lbl):
+        return (9999, 99)
+
+    # Timestamp/datetime/date já trazem ano e mês
+    if isinstance(lbl, date):
+        return (lbl.year, lbl.month)
+
+    try:
+
+        d = pd.to_datetime(lbl)
+
+        return (d.year, d.month)
+
+    except Exception:
+        return (9999, 99)
+
+
+def _map_distinct(values: pd.Series, func, na_value=None) -> np.ndarray:
+    """
+    Aplica func uma vez por valor distinto de values e devolve o resultado
+    (array object) alinhado às linhas; valores nulos recebem na_value.
+    """
+
+    codes, uniques = pd.factorize(values)
+
+    resultado = np.empty(len(uniques) + 1, dtype=object)
+    resultado[:-1] = [func(u) for u in uniques]
+    resultado[-1] = na_value
+
+    # código -1 (nulo) aponta para a última posição
+    return resultado[codes]
+
+
+def periodo_dates_frame(periodos: pd.Series) -> pd.DataFrame:
+    """
+    Per_Inicio / Per_Fim (datas) de cada linha, com parse_periodo_to_dates
+    executado uma vez por Período distinto.
+    """
+
+    datas = _map_distinct(periodos, parse_periodo_to_dates, (None, None))
+
+    return pd.DataFrame(
+        {
+            "Per_Inicio": [d[0] for d in datas],
+            "Per_Fim": [d[1] for d in datas],
+        },
+        index=periodos.index,
+        dtype=object
+    )
+
+
+def periodo_label_text(labels: pd.Series, fmt: str = "%d/%b/%y") -> pd.Series:
+    """
+    Período Label formatado como texto (ex.: 01/Jan/25), uma formatação por mês distinto.
+    """
+
+    labels = pd.to_datetime(labels, errors="coerce")
+
+    return pd.Series(
+        _map_distinct(labels, lambda d: d.strftime(fmt), np.nan),
+        index=labels.index
+    )
+
+
+def fmt_de_ate(dt_ini: date, dt_fim: date) -> str:
+
+    if dt_ini is None or dt_fim is None:
+        return ""
+
+    return f"de {dt_ini.strftime('%d/%m/%Y')} a {dt_fim.strftime('%d/%m/%Y')}"
+# ----------------------- Núcleo de processamento -----------------------
+
+
+class LineClassifier:
+    """
+    Classifica cada linha uma única vez em bits LINHA_*: ruído (cabeçalho/rodapé
+    de página), total, período e prefixo (Tipo de Produto, Paciente, Setor).
+    Os marcadores de ruído viram uma única regex compilada; relatórios de outros
+    hospitais passam os seus em noise_markers.
+    """
+
+    def __init__(self, noise_markers=NOISE_MARKERS):
+
+        self.noise_markers = tuple(noise_markers)
+
+        # sem marcadores: regex que nunca casa
+        self._ruido = re.compile(
+            "|".join(re.escape(m) for m in self.noise_markers) or r"(?!)"
+        ).search
+
+        self._prefixos = tuple(PREFIXOS_LINHA)
+        self._tipo_prefixo = {p[:3]: tipo for p, tipo in PREFIXOS_LINHA.items()}
+
+    def classify(self, line: str) -> int:
+
+        tipo = LINHA_RUIDO if self._ruido(line) else 0
+
+        if MARCADOR_TOTAL in line:
+            tipo |= LINHA_TOTAL
+
+        if MARCADOR_PERIODO in line:
+            tipo |= LINHA_PERIODO
+
+        if line.startswith(self._prefixos):
+            tipo |= self._tipo_prefixo[line[:3]]
+
+        return tipo
+
+    def __reduce__(self):
+        # enviado aos processos de trabalho pelos marcadores (a regex é recompilada lá)
+        return LineClassifier, (self.noise_markers,)
+
+
+# Classificador com os marcadores do Sishop (NOISE_MARKERS)
+DEFAULT_CLASSIFIER = LineClassifier()
+
+
+def iter_lines_periodo(lines, antes=(), depois=(), classificador: LineClassifier = None):
+    """
+    Percorre as linhas uma única vez, classificando cada uma, e devolve
+    (linha, tipo, janela). 'tipo' são os bits LINHA_* de classificador.classify.
+    'janela' é o texto das linhas vizinhas unidas por vírgula quando alguma delas
+    contém "Período" (para reaplicar a regex do período), senão None.
+    'antes'/'depois' são linhas vizinhas de outro bloco do arquivo: entram na
+    janela mas não são devolvidas (processamento em blocos).
+    """
+
+    classify = (classificador or DEFAULT_CLASSIFIER).classify
+
+    janela = deque()
+
+    # soma dos bits LINHA_PERIODO da janela: só importa se é zero
+    n_periodo = 0
+    atual = 0
+
+    for line in antes[-PERIODO_JANELA_ANTES:]:
+        tipo = classify(line)
+        janela.append((line, tipo))
+        n_periodo += tipo & LINHA_PERIODO
+        atual += 1
+
+    def emitir():
+        texto = ",".join(l for l, _ in janela) if n_periodo else None
+        return janela[atual][0], janela[atual][1], texto
+
+    for line in lines:
+
+        tipo = classify(line)
+        janela.append((line, tipo))
+        n_periodo += tipo & LINHA_PERIODO
+
+        if len(janela) - atual > PERIODO_JANELA_DEPOIS:
+
+            yield emitir()
+
+            atual += 1
+
+            if atual > PERIODO_JANELA_ANTES:
+                n_periodo -= janela.popleft()[1] & LINHA_PERIODO
+                atual -= 1
+
+    # linhas do bloco seguinte completam a janela das últimas linhas, uma a uma
+    n_pendentes = len(janela) - atual
+
+    for line in depois[:PERIODO_JANELA_DEPOIS]:
+
+        if not n_pendentes:
+            break
+
+        tipo = classify(line)
+        janela.append((line, tipo))
+        n_periodo += tipo & LINHA_PERIODO
+
+        if len(janela) - atual > PERIODO_JANELA_DEPOIS:
+
+            yield emitir()
+
+            n_pendentes -= 1
+            atual += 1
+
+            if atual > PERIODO_JANELA_ANTES:
+                n_periodo -= janela.popleft()[1] & LINHA_PERIODO
+                atual -= 1
+
+    for _ in range(n_pendentes):
+
+        yield emitir()
+
+        atual += 1
+
+        if atual > PERIODO_JANELA_ANTES:
+            n_periodo -= janela.popleft()[1] & LINHA_PERIODO
+            atual -= 1
+
+
+def parse_paciente_line(line: str):
+    """
+    Retorna (id_nome, entrada, alta, convenio, plano) de uma linha 'Paciente:'.
+    No layout padrão os cinco campos saem de uma única busca (PACIENTE_RE);
+    o resto passa pela leitura campo a campo (_parse_paciente_line_generico).
+    """
+
+    m = PACIENTE_RE.fullmatch(line)
+
+    # cada "  Marcador: " uma única vez, nenhum outro "Plano" e id - nome e plano
+    # presentes (sem eles o strip do campo corta o espaço de um marcador): mesmo
+    # resultado de extract_between / extract_plano, que usam a primeira ocorrência
+    if m is not None and line.count("  ") == 4 and line.count("Plano") == 1:
+
+        id_nome = m.group(1).strip()
+        plano = m.group(5).strip()
+
+        if id_nome and plano:
+            return id_nome, m.group(2).strip(), m.group(3).strip(), m.group(4).strip(), plano
+
+    return _parse_paciente_line_generico(line)
+
+
+def _parse_paciente_line_generico(line: str):
+    """
+    parse_paciente_line campo a campo (csv + extract_between + extract_plano),
+    para linhas fora do layout padrão.
+    """
+
+    fields = next(csv.reader([line]))
+
+    payload = fields[1].strip().strip('"') if len(fields) >= 2 else ""
+
+    p_ent = payload.find("  Entrada: ")
+
+    id_nome = payload[:p_ent].strip() if p_ent != -1 else payload.strip()
+
+    entrada = extract_between(payload, "  Entrada: ", "  Alta: ")
+    alta = extract_between(payload, "  Alta: ", "  Convênio: ")
+    convenio = extract_between(payload, "  Convênio: ", "  Plano: ")
+    plano = extract_plano(payload)
+
+    return id_nome, entrada, alta, convenio, plano
+
+
+def parse_total_line(line: str):
+    """
+    Retorna (qtd_total, custo_atual, consumo_total) de uma linha 'Total do Tipo de Produto:'.
+    """
+
+    tot_fields = next(csv.reader([line]))
+
+    qtd_total = parse_number_us(tot_fields[1]) if len(tot_fields) > 1 else None
+    custo_atual = parse_number_us(tot_fields[2]) if len(tot_fields) > 2 else None
+    consumo_total = parse_number_us(tot_fields[3]) if len(tot_fields) > 3 else None
+
+    return qtd_total, custo_atual, consumo_total
+
+
+def parse_lines(
+    lines,
+    default_periodo: str = "",
+    periodo_inicial=None,
+    antes=(),
+    depois=(),
+    classificador: LineClassifier = None
+):
+    """
+    Parser de passagem única (máquina de estados Setor → Paciente → Tipo de Produto →
+    Total do Tipo de Produto). Lê cada linha uma vez e gera uma tupla por total:
+    (periodo, setor, paciente, entrada, alta, convenio, plano, tipo_produto,
+    qtd_total, custo_atual, consumo_total).
+    Cada linha é classificada uma vez (LineClassifier) e os estados testam os bits.
+    Ao terminar, retorna o período corrente (StopIteration.value).
+    """
+
+    estado = ESTADO_FORA
+
+    current_setor = ""
+    current_periodo = default_periodo if periodo_inicial is None else periodo_inicial
+
+    paciente = ("", "", "", "", "")
+    tipo_produto = ""
+
+    for line, tipo, janela in iter_lines_periodo(lines, antes, depois, classificador):
+
+        if estado == ESTADO_PRODUTO:
+
+            if tipo & LINHA_RUIDO:
+                continue
+
+            if tipo & LINHA_TOTAL:
+
+                yield (
+                    current_periodo or default_periodo,
+                    current_setor,
+                    *paciente,
+                    tipo_produto,
+                    *parse_total_line(line)
+                )
+
+                estado = ESTADO_PACIENTE
+                continue
+
+            if not tipo & (LINHA_TIPO | LINHA_PACIENTE | LINHA_SETOR):
+                continue
+
+            # tipo de produto sem total: a linha é reavaliada no nível do paciente
+            estado = ESTADO_PACIENTE
+
+        if estado == ESTADO_PACIENTE:
+
+            if tipo & (LINHA_PACIENTE | LINHA_SETOR):
+
+                # fim do bloco do paciente: a linha é reavaliada no nível externo
+                estado = ESTADO_FORA
+
+            else:
+
+                if tipo & LINHA_RUIDO:
+                    continue
+
+                if tipo & LINHA_TIPO:
+
+                    prod_fields = next(csv.reader([line]))
+
+                    tipo_produto = prod_fields[1].strip().strip(
+                        '"') if len(prod_fields) > 1 else ""
+
+                    estado = ESTADO_PRODUTO
+
+                continue
+
+        if tipo & LINHA_RUIDO:
+            continue
+
+        if janela is not None:
+
+            m = PERIODO_RE.search(janela)
+
+            current_periodo = (
+                f"{m.group(1)} a {m.group(2)}" if m else default_periodo
+            )
+
+        if tipo & LINHA_SETOR:
+
+            parts = next(csv.reader([line]))
+
+            if len(parts) >= 2:
+                current_setor = parts[1].strip().strip('"')
+
+        elif tipo & LINHA_PACIENTE:
+
+            paciente = parse_paciente_line(line)
+            estado = ESTADO_PACIENTE
+
+    return current_periodo
+
+
+def sniff_encoding(sample: bytes):
+    """
+    Codificação de um trecho do arquivo: pelo BOM (utf-8-sig / utf-16); utf-8 se o
+    trecho for utf-8 válido; senão cp1252 (exportação Windows do Sishop) ou latin-1.
+    None se o trecho for só ASCII (ainda não dá para decidir).
+    """
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    if sample.isascii():
+        return None
+
+    try:
+        # final=False: um caractere cortado no fim do trecho não é erro
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    if any(b in sample for b in CP1252_UNDEFINED):
+        return "latin-1"
+
+    return "cp1252"
+
+
+def iter_text_lines(
+    fileobj,
+    encoding: str = None,
+    errors: str = "ignore",
+    chunk_size: int = 1 << 20,
+    detectada: list = None
+):
+    """
+    Lê o arquivo em blocos e gera as linhas já decodificadas (mesma quebra de
+    str.splitlines), sem manter o texto inteiro em memória.
+    Aceita arquivos binários (decodificados de forma incremental) ou de texto.
+    Sem 'encoding', a codificação é escolhida (sniff_encoding) no primeiro bloco
+    com bytes não ASCII e fica em detectada[0]; cada byte é decodificado uma vez.
+    """
+
+    decoder = None if encoding is None else codecs.getincrementaldecoder(encoding)(errors=errors)
+
+    resto = ""
+
+    while True:
+
+        chunk = fileobj.read(chunk_size)
+
+        if not chunk:
+            break
+
+        if not isinstance(chunk, str):
+
+            if decoder is None:
+
+                codificacao = sniff_encoding(chunk)
+
+                if codificacao is not None:
+
+                    decoder = codecs.getincrementaldecoder(codificacao)(errors=errors)
+
+                    if detectada is not None:
+                        detectada[0] = codificacao
+
+            # só ASCII até aqui: igual em utf-8, cp1252 e latin-1
+            chunk = chunk.decode("ascii") if decoder is None else decoder.decode(chunk)
+
+        partes = (resto + chunk).splitlines(True)
+
+        # a última parte pode estar incompleta (ou ser um "\r" antes de "\n")
+        resto = partes.pop() if partes else ""
+
+        for p in partes:
+            yield p.rstrip(LINE_BREAKS)
+
+    if decoder is not None:
+        resto += decoder.decode(b"", final=True)
+
+    yield from resto.splitlines()
+
+
+def iter_source_lines(fileobj, encoding: str = None, errors: str = "ignore"):
+    """
+    Linhas do arquivo já com a limpeza de ',Setor:,' aplicada.
+    """
+
+    for line in iter_text_lines(fileobj, encoding=encoding, errors=errors):
+        yield line.replace(",Setor:,", ",")
+
+
+def read_header(lines):
+    """
+    Consome o cabeçalho do relatório (até o primeiro Setor/Paciente, com no mínimo
+    5 linhas) e retorna (cabecalho, default_periodo, data_extracao ou None).
+    """
+
+    cabecalho = []
+    fim_cabecalho = False
+
+    for line in lines:
+
+        cabecalho.append(line)
+
+        fim_cabecalho = (
+            fim_cabecalho
+            or line.startswith("Setor:")
+            or line.startswith("Paciente:")
+        )
+
+        # as 5 primeiras linhas sempre entram (detecção do período padrão)
+        if (fim_cabecalho and len(cabecalho) >= 5) or len(cabecalho) >= HEADER_MAX_LINES:
+            break
+
+    default_periodo = detect_periodo_first_lines("\n".join(cabecalho[:5]))
+
+    m_data = DATA_RE.search("\n".join(cabecalho))
+
+    return cabecalho, default_periodo, m_data.group(1) if m_data else None
+
+
+def iter_lines_data(lines, achado: list):
+    """
+    Repassa as linhas procurando a Data de extração enquanto achado[0] for None.
+    Um 'Data:' ainda sem data no fim da linha segue para as linhas seguintes
+    (mesmo resultado da busca no texto inteiro).
+    """
+
+    pendente = ""
+
+    for line in lines:
+
+        if achado[0] is None:
+
+            texto = f"{pendente}\n{line}" if pendente else line
+
+            m = DATA_RE.search(texto)
+
+            if m:
+                achado[0] = m.group(1)
+            else:
+                p = DATA_PENDENTE_RE.search(texto)
+                pendente = texto[p.start():] if p else ""
+
+        yield line
+
+
+def iter_records(
+    fileobj,
+    encoding: str = None,
+    errors: str = "ignore",
+    classificador: LineClassifier = None
+):
+    """
+    Gera os registros de um .txt (Sishop) à medida que cada linha
+    'Total do Tipo de Produto:' é encontrada, na ordem de RECORD_FIELDS.
+    A Data de extração vem do cabeçalho do relatório; se não estiver lá, os registros
+    só são liberados quando ela aparecer.
+    """
+
+    lines = iter_source_lines(fileobj, encoding=encoding, errors=errors)
+
+    cabecalho, default_periodo, data_extracao = read_header(lines)
+
+    achado = [data_extracao]
+
+    # sem Data no cabeçalho, os registros aguardam até a Data aparecer (ou o fim do arquivo)
+    pendentes = []
+
+    for rec in parse_lines(
+        iter_lines_data(itertools.chain(cabecalho, lines), achado),
+        default_periodo,
+        classificador=classificador
+    ):
+
+        if achado[0] is None:
+            pendentes.append(rec)
+            continue
+
+        for p in pendentes:
+            yield (achado[0],) + p
+
+        pendentes.clear()
+
+        yield (achado[0],) + rec
+
+    for p in pendentes:
+        yield (achado[0] or "DATA_NAO_ENCONTRADA",) + p
+
+
+def _memo_map(values, func) -> list:
+    """
+    Aplica func uma vez por valor distinto e devolve a lista alinhada a values.
+    """
+
+    memo = {v: func(v) for v in set(values)}
+
+    return [memo[v] for v in values]
+
+
+def _split_registro_nome(paciente: str) -> tuple:
+    partes = paciente.split(" - ", 1)
+    return partes[0], partes[1] if len(partes) > 1 else None
+
+
+def records_to_frame(recs, origem_nome: str = "", upload_seq: int = 0) -> pd.DataFrame:
+    """
+    Monta o DataFrame (Paciente x Tipo de Produto) a partir de tuplas RECORD_FIELDS.
+    As tuplas são transpostas em colunas de uma vez; valores repetidos
+    (Período Label, Registro/Nome do paciente) são calculados uma vez por valor distinto.
+    """
+
+    linhas = list(recs)
+
+    if not linhas:
+        return pd.DataFrame(columns=EMPTY_FRAME_COLUMNS)
+
+    n = len(linhas)
+
+    colunas = dict(zip(RECORD_FIELDS, map(list, zip(*linhas))))
+
+    del linhas
+
+    # ============================================================
+    # ALTERAÇÃO 2 — SPLIT DA COLUNA PACIENTE
+    # ============================================================
+
+    registro_nome = _memo_map(colunas.pop("Paciente"), _split_registro_nome)
+
+    colunas["Registro"], colunas["Nome do Paciente"] = map(list, zip(*registro_nome))
+
+    colunas["Período Label"] = _memo_map(colunas["Período"], periodo_label_br)
+
+    colunas["Arquivo Origem"] = [origem_nome] * n
+    colunas["Upload Seq"] = [upload_seq] * n
+
+    return pd.DataFrame(colunas, columns=FRAME_COLUMNS)
+
+
+def process_txt_file(
+    fileobj,
+    origem_nome: str = "",
+    upload_seq: int = 0,
+    encoding: str = None,
+    classificador: LineClassifier = None
+) -> pd.DataFrame:
+    """
+    Processa um arquivo .txt (Sishop) aberto, em streaming, e retorna o DataFrame
+    com linhas por (Paciente x Tipo de Produto).
+    Sem 'encoding', a codificação é detectada (sniff_encoding); sem 'classificador',
+    as linhas de ruído são as de NOISE_MARKERS.
+    """
+
+    return records_to_frame(
+        iter_records(fileobj, encoding=encoding, classificador=classificador),
+        origem_nome=origem_nome,
+        upload_seq=upload_seq
+    )
+
+
+def process_txt_content(txt: str, origem_nome: str = "", upload_seq: int = 0) -> pd.DataFrame:
+    """
+    Processa o conteúdo de um .txt (Sishop) e retorna o DataFrame com linhas por (Paciente x Tipo de Produto).
+    """
+
+    return process_txt_file(io.StringIO(txt), origem_nome=origem_nome, upload_seq=upload_seq)
+
+
+def is_setor_boundary(line: str, classificador: LineClassifier = None) -> bool:
+    """
+    Linha 'Setor:' onde o arquivo pode ser cortado: zera o setor e sempre leva
+    a máquina de estados ao nível externo.
+    """
+
+    tipo = (classificador or DEFAULT_CLASSIFIER).classify(line)
+
+    if not tipo & LINHA_SETOR:
+        return False
+
+    if tipo & (LINHA_RUIDO | LINHA_TOTAL):
+        return False
+
+    return len(next(csv.reader([line]))) >= 2
+
+
+def split_setor_chunks(lines, chunk_lines: int = CHUNK_LINES, classificador: LineClassifier = None):
+    """
+    Agrupa as linhas em blocos de pelo menos chunk_lines linhas, cortando apenas
+    antes de uma linha 'Setor:'.
+    """
+
+    bloco = []
+
+    for line in lines:
+
+        if len(bloco) >= chunk_lines and is_setor_boundary(line, classificador):
+            yield bloco
+            bloco = []
+
+        bloco.append(line)
+
+    if bloco:
+        yield bloco
+
+
+def _parse_chunk(lines, antes, depois, default_periodo: str, periodo_inicial, classificador=None) -> tuple:
+    """
+    Processa um bloco e devolve (registros, período ao final do bloco).
+    Registros anteriores ao primeiro período do bloco saem com PERIODO_HERDADO.
+    """
+
+    gen = parse_lines(lines, default_periodo, periodo_inicial, antes, depois, classificador)
+
+    records = []
+
+    while True:
+
+        try:
+            records.append(next(gen))
+        except StopIteration as fim:
+            return records, fim.value
+
+
+def process_txt_file_chunked(
+    fileobj,
+    origem_nome: str = "",
+    upload_seq: int = 0,
+    encoding: str = None,
+    workers: int = 2,
+    chunk_lines: int = CHUNK_LINES,
+    classificador: LineClassifier = None
+) -> pd.DataFrame:
+    """
+    Igual a process_txt_file, mas corta o arquivo em blocos nas linhas 'Setor:' e
+    processa os blocos em paralelo. O período de cada bloco é herdado do anterior
+    na junção, mantendo o resultado idêntico ao processamento serial.
+    """
+
+    lines = iter_source_lines(fileobj, encoding=encoding)
+
+    cabecalho, default_periodo, data_extracao = read_header(lines)
+
+    achado = [data_extracao]
+
+    blocos = split_setor_chunks(
+        iter_lines_data(itertools.chain(cabecalho, lines), achado),
+        chunk_lines,
+        classificador
+    )
+
+    futures = []
+    results = []
+
+    # "spawn" evita herdar as threads do servidor Streamlit no fork
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+
+        anterior = None
+        antes = []
+
+        def enviar(bloco, depois):
+            periodo_inicial = None if not futures else PERIODO_HERDADO
+            futures.append(
+                executor.submit(
+                    _parse_chunk, bloco, antes, depois, default_periodo, periodo_inicial, classificador
+                )
+            )
+
+        # cada bloco só é enviado quando o seguinte existe (linhas de 'depois' da janela)
+        for bloco in blocos:
+
+            if anterior is not None:
+
+                enviar(anterior, bloco[:PERIODO_JANELA_DEPOIS])
+
+                antes = anterior[-PERIODO_JANELA_ANTES:]
+
+                # limita os blocos em espera na memória
+                if len(futures) - len(results) >= 2 * workers:
+                    results.append(futures[len(results)].result())
+
+            anterior = bloco
+
+        if anterior is not None:
+            enviar(anterior, [])
+
+        results.extend(fut.result() for fut in futures[len(results):])
+
+    data_final = achado[0] or "DATA_NAO_ENCONTRADA"
+
+    def juntar():
+
+        periodo = default_periodo
+
+        for records, periodo_final in results:
+
+            for rec in records:
+
+                if rec[0] == PERIODO_HERDADO:
+                    rec = (periodo or default_periodo,) + rec[1:]
+
+                yield (data_final,) + rec
+
+            if periodo_final != PERIODO_HERDADO:
+                periodo = periodo_final
+
+    return records_to_frame(juntar(), origem_nome=origem_nome, upload_seq=upload_seq)
+
+
+def _parse_file_info(name: str, upload_seq: int, data, encoding: str = None, classificador=None) -> tuple:
+    """
+    Processa um arquivo (bytes ou texto) e devolve (DataFrame, segundos).
+    Função de módulo para poder ser enviada aos processos de trabalho.
+    """
+
+    t0 = time.perf_counter()
+
+    fileobj = io.StringIO(data) if isinstance(data, str) else io.BytesIO(data)
+
+    df = process_txt_file(
+        fileobj,
+        origem_nome=name,
+        upload_seq=upload_seq,
+        encoding=encoding,
+        classificador=classificador
+    )
+
+    return df, time.perf_counter() - t0
+
+
+def _info_data(info):
+
+    if "file" in info:
+
+        info["file"].seek(0)
+
+        return info["file"].read()
+
+    return info["text"]
+
+
+def _parse_info(info, classificador=None) -> tuple:
+    """
+    Processa um dict de arquivo no próprio processo (handle em streaming).
+    """
+
+    if "file" not in info:
+        return _parse_file_info(info["name"], info["upload_seq"], info["text"], classificador=classificador)
+
+    t0 = time.perf_counter()
+
+    info["file"].seek(0)
+
+    df = process_txt_file(
+        info["file"],
+        origem_nome=info["name"],
+        upload_seq=info["upload_seq"],
+        encoding=info.get("encoding"),
+        classificador=classificador
+    )
+
+    return df, time.perf_counter() - t0
+
+
+def _parse_infos(file_infos, workers: int = 0, classificador=None) -> list:
+    """
+    Processa os arquivos e devolve [(DataFrame, segundos)] na ordem de file_infos.
+    """
+
+    if not file_infos:
+        return []
+
+    if workers and workers > 1 and len(file_infos) == 1:
+
+        info = file_infos[0]
+
+        t0 = time.perf_counter()
+
+        if "file" in info:
+            info["file"].seek(0)
+
+        df_info = process_txt_file_chunked(
+            info["file"] if "file" in info else io.StringIO(info["text"]),
+            origem_nome=info["name"],
+            upload_seq=info["upload_seq"],
+            encoding=info.get("encoding"),
+            workers=workers,
+            classificador=classificador
+        )
+
+        return [(df_info, time.perf_counter() - t0)]
+
+    if workers and workers > 1:
+
+        # "spawn" evita herdar as threads do servidor Streamlit no fork
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(file_infos)),
+            mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+
+            futures = [
+                executor.submit(
+                    _parse_file_info,
+                    info["name"],
+                    info["upload_seq"],
+                    _info_data(info),
+                    info.get("encoding"),
+                    classificador
+                )
+                for info in file_infos
+            ]
+
+            return [fut.result() for fut in futures]
+
+    return [_parse_info(info, classificador) for info in file_infos]
+
+
+def process_multiple_texts(
+    file_infos,
+    workers: int = 0,
+    cache=None,
+    classificador: LineClassifier = None
+) -> pd.DataFrame:
+    """
+    Recebe lista de dicts {'name','file' (ou 'text'),'upload_seq'} já filtrada (sem meses duplicados),
+    com 'encoding' opcional (o de scan_file; sem ele, detectado na leitura).
+    Com workers > 1 e mais de um arquivo, os arquivos são processados em paralelo
+    (ProcessPoolExecutor); com um único arquivo, ele é dividido em blocos por Setor.
+    Com cache (ParseCache), arquivos já processados (mesmo conteúdo) não são relidos.
+    'classificador' (LineClassifier) troca os marcadores de linhas de ruído.
+    O resultado mantém a ordem de file_infos.
+    Cada dict recebe 'tempo_parse' (segundos), 'registros', 'cache' (bool) e,
+    com cache, 'cache_key'.
+    """
+
+    if not file_infos:
+        return pd.DataFrame()
+
+    results = [None] * len(file_infos)
+    chaves = [None] * len(file_infos)
+
+    if cache is not None:
+
+        for pos, info in enumerate(file_infos):
+
+            t0 = time.perf_counter()
+
+            chaves[pos] = info["cache_key"] = cache.key(info, classificador)
+
+            df_cache = cache.get(chaves[pos])
+
+            if df_cache is not None:
+
+                # o conteúdo é o mesmo; nome e sequência são os do upload atual
+                df_info = df_cache.assign(**{
+                    "Arquivo Origem": info["name"],
+                    "Upload Seq": info["upload_seq"]
+                }) if not df_cache.empty else df_cache
+
+                results[pos] = (df_info, time.perf_counter() - t0)
+
+    faltantes = [pos for pos, r in enumerate(results) if r is None]
+
+    parsed = _parse_infos(
+        [file_infos[pos] for pos in faltantes],
+        workers=workers,
+        classificador=classificador
+    )
+
+    for pos, r in zip(faltantes, parsed):
+
+        results[pos] = r
+
+        if cache is not None:
+            cache.put(chaves[pos], r[0])
+
+    parsed_pos = set(faltantes)
+
+    frames = []
+
+    for pos, (info, (df_info, segundos)) in enumerate(zip(file_infos, results)):
+
+        info["tempo_parse"] = segundos
+        info["registros"] = len(df_info)
+        info["cache"] = pos not in parsed_pos
+
+        frames.append(df_info)
+
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,456 @@
+# ============================================================
+# prisma/pipeline.py — Etapas da conversão, sem interface
+# Usadas pelo app Streamlit e pela linha de comando (python -m prisma)
+# ============================================================
+
+import numpy as np
+import pandas as pd
+
+from prisma.depara import apply_depara, load_depara
+from prisma.parser import (
+    HEADER_CHUNK_SIZE,
+    iter_text_lines,
+    parse_periodo_to_dates,
+    periodo_dates_frame,
+    periodo_label_br,
+    process_multiple_texts,
+    read_header,
+)
+from prisma.schema import compact_schema, memory_mb
+
+NUMERIC_COLUMNS = ["Qtd. Total", "Custo Atual", "Consumo Total"]
+
+# Cubo mensal: dimensões (o setor entra como Setor Agrupado ou Setor) e medidas somáveis
+CUBE_DIMENSIONS = ["Convênio", "Tipo de Produto"]
+CUBE_SUM_COLUMNS = ["Cont. Pac.&Setor Unico", "Qtd. Total", "Consumo Total"]
+
+# Pacientes distintos por mês × valor de cada dimensão: como Cont. Pac.&Setor Unico,
+# cada Registro × mês × valor é contado em uma única célula do cubo (somável)
+CUBE_PATIENT_COLUMNS = {c: f"Pacientes por {c}" for c in CUBE_DIMENSIONS}
+
+# Tendência: {medida exibida: coluna do cubo} e janela padrão da média móvel (meses)
+# (Volume de Atendimentos por Convênio / Tipo de Produto usa CUBE_PATIENT_COLUMNS)
+TREND_MEASURES = {
+    "Volume de Atendimentos": "Cont. Pac.&Setor Unico",
+    "Qtd. Total": "Qtd. Total",
+    "Consumo Total": "Consumo Total",
+}
+TREND_WINDOW = 3
+
+
+# ------------------- Pré-filtragem dos arquivos -------------------
+
+def scan_file(fileobj, name: str, upload_seq: int) -> dict:
+    """
+    Lê só os primeiros blocos do arquivo (cabeçalho do relatório) para obter
+    o período, a Data de extração e a codificação (None se o cabeçalho for só
+    ASCII: fica para a leitura); o conteúdo só é decodificado inteiro depois,
+    e apenas para os arquivos mantidos. Volta o arquivo ao início.
+    """
+
+    fileobj.seek(0)
+
+    codificacao = [None]
+
+    _, periodo, data_extracao = read_header(
+        iter_text_lines(fileobj, chunk_size=HEADER_CHUNK_SIZE, detectada=codificacao)
+    )
+
+    fileobj.seek(0)
+
+    dt_ini, dt_fim = parse_periodo_to_dates(periodo)
+
+    return {
+
+        "name": name,
+        "file": fileobj,
+
+        "period": periodo,
+        "label": periodo_label_br(periodo),
+
+        "ini": dt_ini,
+        "fim": dt_fim,
+
+        "extracao": data_extracao,
+        "encoding": codificacao[0],
+
+        "upload_seq": upload_seq
+
+    }
+
+
+def select_files(file_infos: list):
+    """
+    Um arquivo por mês (Período Label): o de período que termina mais tarde;
+    no empate, o de Data de extração mais recente e depois o enviado por último.
+    Retorna (mantidos, descartados).
+    """
+
+    df_files = pd.DataFrame(file_infos)
+
+    if df_files.empty:
+        return [], []
+
+    df_files["_fim_ord"] = pd.to_datetime(df_files["fim"], errors="coerce")
+
+    df_files["_extr_ord"] = pd.to_datetime(df_files["extracao"], format="%d/%m/%Y", errors="coerce")
+
+    df_files = df_files.sort_values(
+        by=["label", "_fim_ord", "_extr_ord", "upload_seq"],
+        ascending=[True, False, False, False]
+    )
+
+    mask_dup = df_files.duplicated(subset=["label"], keep="first")
+
+    colunas = [c for c in df_files.columns if c not in ("_fim_ord", "_extr_ord")]
+
+    kept_df = df_files.loc[~mask_dup, colunas]
+    disc_df = df_files.loc[mask_dup, colunas]
+
+    return kept_df.to_dict(orient="records"), disc_df.to_dict(orient="records")
+
+
+# ------------------- Consolidação -------------------
+
+def _codes(s: pd.Series, sort: bool = False) -> np.ndarray:
+    """
+    Códigos inteiros de factorize; nulos recebem o maior código
+    (ficam por último, como em sort_values).
+    """
+
+    codes, uniques = pd.factorize(s, sort=sort)
+
+    return np.where(codes < 0, len(uniques), codes)
+
+
+def _combine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Uma chave inteira por par (a, b) que preserva a ordem (a, b).
+    Se o produto puder estourar int64, a chave é recodificada antes.
+    """
+
+    base = int(b.max(initial=0)) + 1
+
+    if (int(a.max(initial=0)) + 1) * base >= 2 ** 62:
+        a = pd.factorize(a, sort=True)[0]
+
+    return a.astype(np.int64) * base + b
+
+
+def unique_patient_flags(df: pd.DataFrame, coluna_setor: str = None):
+    """
+    Mesma regra de sort_values(Registro, setor) + duplicated(Registro, setor, mês),
+    com chaves inteiras (factorize) em vez de strings.
+    Retorna (ordem, primeiro): posições das linhas na ordem final e, nessa ordem,
+    True na primeira linha de cada Registro × setor × Período Label.
+    """
+
+    coluna_setor = coluna_setor or setor_column(df)
+
+    # códigos em ordem alfabética: a chave (Registro, setor) ordena como as strings
+    chave = _combine(
+        _codes(df["Registro"], sort=True),
+        _codes(df[coluna_setor], sort=True)
+    )
+
+    # ordenação estável: empates mantêm a ordem original, como sort_values
+    ordem = np.argsort(chave, kind="stable")
+
+    chave = _combine(chave, _codes(df["Período Label"]))[ordem]
+
+    primeiro = ~pd.Series(chave).duplicated(keep="first").to_numpy()
+
+    return ordem, primeiro
+
+
+def count_unique_patients(df: pd.DataFrame, coluna_setor: str = None) -> pd.Series:
+    """
+    Pacientes distintos (Registro) por setor × Período Label, direto das chaves
+    inteiras (sem ordenar o DataFrame). Igual à soma de "Cont. Pac.&Setor Unico".
+    """
+
+    coluna_setor = coluna_setor or setor_column(df)
+
+    validos = df[coluna_setor].notna().to_numpy() & df["Período Label"].notna().to_numpy()
+
+    grupo = _combine(_codes(df[coluna_setor]), _codes(df["Período Label"]))
+
+    chave = _combine(_codes(df["Registro"]), grupo)
+
+    unicos = ~pd.Series(chave).duplicated(keep="first").to_numpy() & validos
+
+    contagem = pd.Series(unicos.astype(np.int64)).groupby(
+        [df[coluna_setor].to_numpy(), df["Período Label"].to_numpy()],
+        dropna=True
+    ).sum()
+
+    contagem.index.names = [coluna_setor, "Período Label"]
+    contagem.name = "Pacientes Únicos"
+
+    return contagem
+
+
+def mark_unique_patients(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Ordena por Registro e setor e cria "Cont. Pac.&Setor Unico"
+    (1 na primeira linha de cada Registro × setor × mês).
+    Retorna um novo DataFrame (índice 0..n-1).
+    """
+
+    ordem, primeiro = unique_patient_flags(df)
+
+    df = df.take(ordem).reset_index(drop=True)
+
+    df["Cont. Pac.&Setor Unico"] = primeiro.astype(int)
+
+    return df
+
+
+def to_numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+
+    for c in NUMERIC_COLUMNS:
+
+        if c in df.columns and not pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    return df
+
+
+def add_periodo_dates(df: pd.DataFrame) -> pd.DataFrame:
+
+    # datas calculadas uma vez por Período distinto
+    df[["Per_Inicio", "Per_Fim"]] = periodo_dates_frame(df["Período"])
+
+    return df
+
+
+def latest_label(df: pd.DataFrame):
+    """
+    Período Label do mês cujo período termina mais tarde (None se não houver).
+    """
+
+    if df.empty:
+        return None
+
+    df_label_maxfim = (
+        df.groupby("Período Label")["Per_Fim"]
+        .max()
+        .reset_index()
+        .dropna(subset=["Per_Fim"])
+    )
+
+    if df_label_maxfim.empty:
+        return None
+
+    return df_label_maxfim.loc[
+        df_label_maxfim["Per_Fim"].idxmax(),
+        "Período Label"
+    ]
+
+
+def consolidate(
+    kept_infos: list,
+    depara_path: str = None,
+    workers: int = 0,
+    cache=None,
+    compact: bool = False,
+    classificador=None,
+    memoria: list = None
+) -> pd.DataFrame:
+    """
+    Arquivos já filtrados → consolidado com Setor Agrupado, Cont. Pac.&Setor Unico,
+    colunas numéricas e Per_Inicio / Per_Fim (usado pelo app, CLI e modo contínuo).
+    Com compact e uma lista em 'memoria', acrescenta (MB antes, MB depois) do esquema compacto.
+    """
+
+    df = process_multiple_texts(kept_infos, workers=workers, cache=cache, classificador=classificador)
+
+    if df.empty:
+        return df
+
+    mapa_depara = load_depara(depara_path) if depara_path else None
+
+    if mapa_depara is not None:
+        apply_depara(df, mapa_depara)
+
+    df = mark_unique_patients(df)
+
+    if compact:
+
+        mem_antes = memory_mb(df) if memoria is not None else None
+
+        df = compact_schema(df)
+
+        if memoria is not None:
+            memoria.append((mem_antes, memory_mb(df)))
+
+    to_numeric_columns(df)
+
+    return add_periodo_dates(df)
+
+
+# ------------------- Resumo -------------------
+
+def setor_column(df: pd.DataFrame) -> str:
+    return "Setor Agrupado" if "Setor Agrupado" in df.columns else "Setor"
+
+
+def volume_by_setor(df: pd.DataFrame) -> pd.Series:
+    """
+    Pacientes únicos (Cont. Pac.&Setor Unico) por setor, do maior para o menor.
+    Aceita o consolidado ou o cubo mensal (build_cube): o resultado é o mesmo.
+    """
+
+    return (
+        df
+        .groupby(setor_column(df), observed=True)["Cont. Pac.&Setor Unico"]
+        .sum()
+        .sort_values(ascending=False)
+    )
+
+
+def summary_table(volume: pd.Series) -> pd.DataFrame:
+    """
+    Tabela "Resumo" (volume e % do total por Setor Agrupado).
+    """
+
+    df_resumo = volume.reset_index()
+
+    df_resumo.columns = [
+        "Setor Agrupado",
+        "Volume de Atendimentos"
+    ]
+
+    if not df_resumo.empty:
+
+        df_resumo["% do Total"] = (
+
+            df_resumo["Volume de Atendimentos"]
+            / df_resumo["Volume de Atendimentos"].sum()
+            * 100
+
+        ).round(2)
+
+    return df_resumo
+
+
+# ------------------- Cubo mensal -------------------
+
+def build_cube(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Agregado mês × setor × Convênio × Tipo de Produto com:
+    'Pacientes' (Registros distintos na célula), soma de Cont. Pac.&Setor Unico
+    (somável até mês × setor: cada paciente é contado em uma única célula),
+    'Pacientes por Convênio' / 'Pacientes por Tipo de Produto' (o mesmo, somável
+    até mês × Convênio / mês × Tipo de Produto), Qtd. Total, Consumo Total e 'Linhas'.
+    """
+
+    coluna_setor = setor_column(df)
+
+    dims = ["Período Label", coluna_setor] + [c for c in CUBE_DIMENSIONS if c in df.columns]
+
+    base = df[dims + ["Registro"]].copy()
+
+    # somas em float64 mesmo com o esquema compacto (float32)
+    for c in CUBE_SUM_COLUMNS:
+        base[c] = pd.to_numeric(df[c], errors="coerce").astype("float64") if c in df.columns else 0.0
+
+    base["Cont. Pac.&Setor Unico"] = base["Cont. Pac.&Setor Unico"].astype("int64")
+
+    contagens = {}
+
+    for c, coluna in CUBE_PATIENT_COLUMNS.items():
+
+        if c in df.columns:
+
+            # 1 na primeira linha de cada Registro × mês × valor (Registro nulo não conta, como em nunique)
+            base[coluna] = (
+                ~base.duplicated(["Período Label", "Registro", c]) & base["Registro"].notna()
+            ).astype("int64")
+
+            contagens[coluna] = (coluna, "sum")
+
+    cube = (
+        base
+        .groupby(dims, dropna=False, observed=True, sort=True)
+        .agg(
+            **{
+                "Pacientes": ("Registro", "nunique"),
+                "Cont. Pac.&Setor Unico": ("Cont. Pac.&Setor Unico", "sum"),
+                **contagens,
+                "Qtd. Total": ("Qtd. Total", "sum"),
+                "Consumo Total": ("Consumo Total", "sum"),
+                "Linhas": ("Registro", "size"),
+            }
+        )
+        .reset_index()
+    )
+
+    return cube
+
+
+# ------------------- Tendência mensal -------------------
+
+def trend_matrix(cube: pd.DataFrame, dimensao: str, medida: str) -> pd.DataFrame:
+    """
+    Meses (linhas, todos os meses do intervalo; mês sem movimento = 0) × valores
+    de 'dimensao' (colunas) com a soma da medida (chave de TREND_MEASURES).
+    Colunas em ordem decrescente do total no período.
+    """
+
+    if cube.empty:
+        return pd.DataFrame()
+
+    coluna = TREND_MEASURES[medida]
+
+    # um paciente com vários tipos de produto / convênios conta em cada um deles
+    if coluna == "Cont. Pac.&Setor Unico":
+        coluna = CUBE_PATIENT_COLUMNS.get(dimensao, coluna)
+
+    matriz = (
+        cube
+        .groupby(["Período Label", dimensao], observed=True)[coluna]
+        .sum()
+        .unstack(dimensao, fill_value=0)
+    )
+
+    matriz.index = pd.to_datetime(matriz.index)
+
+    meses = pd.date_range(matriz.index.min(), matriz.index.max(), freq="MS")
+
+    matriz = matriz.reindex(meses, fill_value=0)
+    matriz.index.name = "Período Label"
+
+    matriz.columns = matriz.columns.astype(object)
+
+    return matriz[matriz.sum().sort_values(ascending=False, kind="stable").index]
+
+
+def trend_table(matriz: pd.DataFrame, janela: int = TREND_WINDOW) -> pd.DataFrame:
+    """
+    trend_matrix em formato longo, com variação sobre o mês anterior
+    (absoluta e %) e média móvel de 'janela' meses, por valor da dimensão.
+    """
+
+    if matriz.empty:
+        return pd.DataFrame()
+
+    variacao = matriz.diff()
+
+    # mês anterior zerado: variação % indefinida
+    anterior = matriz.shift().replace(0, np.nan)
+
+    partes = {
+        "Valor": matriz,
+        "Variação": variacao,
+        "Variação %": (variacao / anterior * 100).round(2),
+        f"Média Móvel {janela}m": matriz.rolling(janela, min_periods=1).mean().round(2),
+    }
+
+    longa = pd.concat(
+        {nome: m.stack(future_stack=True) for nome, m in partes.items()},
+        axis=1
+    )
+
+    return longa.reset_index()
+
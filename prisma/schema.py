@@ -0,0 +1,204 @@
+# ============================================================
+# prisma/schema.py — Esquema compacto do DataFrame consolidado
+# Categóricos para textos repetidos, float32 quando não perde nenhum valor,
+# datas reais para Entrada/Alta e Registro inteiro quando nada se perde.
+# canonical_schema desfaz a conversão (esquema único da memória histórica)
+# ============================================================
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Textos repetidos em milhares de linhas
+CATEGORY_COLUMNS = (
+    "Arquivo Origem",
+    "Extração Sishop",
+    "Período",
+    "Setor",
+    "Setor Agrupado",
+    "Convênio",
+    "Plano",
+    "Tipo de Produto",
+)
+
+# Valores lidos do texto (float32 só se cada valor voltar ao mesmo float64)
+FLOAT_COLUMNS = (
+    "Qtd. Total",
+    "Custo Atual",
+    "Consumo Total",
+)
+
+# Texto dd/mm/aaaa que vira datetime se toda data voltar ao mesmo texto
+DATE_COLUMNS = (
+    "Entrada",
+    "Alta",
+)
+
+INT_COLUMNS = (
+    "Upload Seq",
+    "Cont. Pac.&Setor Unico",
+)
+
+# Chaves de texto que viram int64 se todos os valores forem inteiros canônicos
+INT_KEY_COLUMNS = (
+    "Registro",
+)
+
+# Sem zeros à esquerda e cabendo em int64: str(int(x)) devolve o mesmo texto
+INT_KEY_RE = re.compile(r"0|[1-9]\d{0,17}")
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def float32_to_float64(s: pd.Series) -> pd.Series:
+    """
+    float32 de volta ao float64 do texto original, pela representação decimal
+    mais curta do float32 (27.33 e não 27.329999923706055).
+    Cada valor distinto é convertido uma vez.
+    """
+
+    codes, uniques = pd.factorize(s)
+
+    valores = np.asarray(uniques, dtype="float32").astype(str).astype("float64")
+
+    return pd.Series(
+        np.where(codes < 0, np.nan, valores.take(codes)),
+        index=s.index,
+        name=s.name
+    )
+
+
+def to_float32_if_exact(s: pd.Series) -> pd.Series:
+    """
+    Converte para float32 apenas se float32_to_float64 devolver exatamente
+    todos os valores (casas além dos centavos ou valores grandes ficam em float64).
+    """
+
+    s = pd.to_numeric(s, errors="coerce")
+
+    s32 = s.astype("float32")
+
+    diferente = (float32_to_float64(s32) != s) & s.notna()
+
+    return s if diferente.any() else s32
+
+
+def to_datetime_if_exact(s: pd.Series) -> pd.Series:
+    """
+    Converte dd/mm/aaaa para datetime apenas se toda data não vazia voltar ao
+    mesmo texto (vazias viram NaT e voltam como ""); senão mantém a coluna.
+    Só os valores distintos são conferidos.
+    """
+
+    codes, uniques = pd.factorize(s)
+
+    if (codes < 0).any() or not all(isinstance(v, str) for v in uniques):
+        return s
+
+    datas = pd.to_datetime(pd.Series(uniques), format="%d/%m/%Y", errors="coerce")
+
+    volta = datas.dt.strftime("%d/%m/%Y").fillna("")
+
+    if (volta != pd.Series(uniques)).any():
+        return s
+
+    return pd.Series(
+        datas.to_numpy().take(codes),
+        index=s.index,
+        name=s.name
+    )
+
+
+def to_int_key_if_exact(s: pd.Series) -> pd.Series:
+    """
+    Converte para int64 apenas se todo valor for um inteiro canônico (o texto
+    volta igual); senão mantém a coluna. Só os valores distintos são conferidos.
+    """
+
+    codes, uniques = pd.factorize(s)
+
+    if (codes < 0).any() or not all(
+        isinstance(v, str) and INT_KEY_RE.fullmatch(v) for v in uniques
+    ):
+        return s
+
+    return pd.Series(
+        uniques.astype("int64").take(codes),
+        index=s.index,
+        name=s.name
+    )
+
+
+def compact_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte as colunas do consolidado para tipos compactos, coluna a coluna
+    (sem copiar o DataFrame inteiro). Colunas já convertidas são mantidas.
+    """
+
+    for c in CATEGORY_COLUMNS:
+
+        if c in df.columns and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype("category")
+
+    for c in FLOAT_COLUMNS:
+
+        if c in df.columns and df[c].dtype != "float32":
+            df[c] = to_float32_if_exact(df[c])
+
+    for c in DATE_COLUMNS:
+
+        if c in df.columns and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = to_datetime_if_exact(df[c])
+
+    for c in INT_COLUMNS:
+
+        if c in df.columns and pd.api.types.is_integer_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], downcast="integer")
+
+    for c in INT_KEY_COLUMNS:
+
+        if c in df.columns and df[c].dtype == object:
+            df[c] = to_int_key_if_exact(df[c])
+
+    return df
+
+
+def canonical_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Inverso de compact_schema: os tipos do consolidado padrão (textos, float64,
+    int64, Entrada/Alta como texto dd/mm/aaaa e Registro como texto).
+    Devolve um novo DataFrame (o original não é alterado); colunas já no
+    esquema padrão não são copiadas.
+    """
+
+    df = df.copy(deep=False)
+
+    for c in CATEGORY_COLUMNS:
+
+        if c in df.columns and isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(object)
+
+    for c in FLOAT_COLUMNS:
+
+        if c in df.columns and df[c].dtype == "float32":
+            df[c] = float32_to_float64(df[c])
+
+    for c in DATE_COLUMNS:
+
+        if c in df.columns and pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].dt.strftime("%d/%m/%Y").fillna("")
+
+    for c in INT_COLUMNS:
+
+        if c in df.columns and pd.api.types.is_integer_dtype(df[c]) and df[c].dtype != "int64":
+            df[c] = df[c].astype("int64")
+
+    for c in INT_KEY_COLUMNS:
+
+        if c in df.columns and pd.api.types.is_integer_dtype(df[c]):
+            df[c] = df[c].astype(str).astype(object)
+
+    return df
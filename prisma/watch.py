@@ -0,0 +1,282 @@
+# ============================================================
+# prisma/watch.py — Ingestão contínua de uma pasta de exportações Sishop
+# Varredura periódica (polling): arquivos novos ou alterados entram numa fila
+# limitada; cada um é lido, gravado na memória histórica e os arquivos
+# consolidados dos meses afetados são gerados de novo
+# ============================================================
+
+import json
+import os
+import queue
+import threading
+import time
+
+from prisma.cache import ParseCache
+from prisma.cli import expand_inputs, write_outputs
+from prisma.historico import load_history, upsert_history
+from prisma.pipeline import consolidate, scan_file
+
+# Segundos entre varreduras da pasta
+WATCH_INTERVAL = 5.0
+
+# Arquivos aguardando leitura; com a fila cheia a varredura espera (contrapressão)
+WATCH_QUEUE_SIZE = 4
+
+# Estado (arquivos já processados) gravado no diretório de saída
+WATCH_STATE_FILE = ".prisma_watch.json"
+
+
+def _signature(path: str):
+    """
+    (mtime_ns, tamanho) do arquivo; None se ele sumiu.
+    """
+
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    return [st.st_mtime_ns, st.st_size]
+
+
+class FolderWatcher:
+    """
+    Observa diretórios/padrões glob e processa cada .txt novo ou alterado.
+    Um arquivo só entra na fila quando a assinatura (mtime, tamanho) se repete
+    em duas varreduras seguidas, para não ler um arquivo ainda sendo copiado.
+    """
+
+    def __init__(
+        self,
+        entradas: list,
+        historico: str,
+        saida: str,
+        formatos=("xlsx",),
+        depara_path: str = None,
+        cache_dir: str = None,
+        compact: bool = False,
+        classificador=None,
+        intervalo: float = WATCH_INTERVAL,
+        max_fila: int = WATCH_QUEUE_SIZE,
+        log=print
+    ):
+
+        self.entradas = list(entradas)
+        self.historico = historico
+        self.saida = saida
+        self.formatos = list(formatos)
+        self.depara_path = depara_path
+        self.compact = compact
+        self.classificador = classificador
+        self.intervalo = intervalo
+        self.log = log
+
+        self.cache = ParseCache(cache_dir=cache_dir) if cache_dir else None
+
+        self.fila = queue.Queue(maxsize=max_fila)
+        self.parar = threading.Event()
+
+        self.estado_path = os.path.join(saida, WATCH_STATE_FILE)
+
+        # {caminho: assinatura já processada}
+        self.processados = self._load_state()
+
+        # {caminho: assinatura vista na última varredura}
+        self._vistos = {}
+
+        # caminhos na fila ou em processamento
+        self._pendentes = set()
+        self._lock = threading.Lock()
+
+        self._seq = 0
+
+    # ------------------- Estado -------------------
+
+    def _load_state(self) -> dict:
+
+        try:
+            with open(self.estado_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+
+        tmp = f"{self.estado_path}.tmp"
+
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.processados, f)
+
+        os.replace(tmp, self.estado_path)
+
+    # ------------------- Varredura -------------------
+
+    def poll(self) -> list:
+        """
+        Caminhos prontos para processar (novos/alterados e estáveis).
+        """
+
+        prontos = []
+        vistos = {}
+
+        for caminho in expand_inputs(self.entradas):
+
+            assinatura = _signature(caminho)
+
+            if assinatura is None:
+                continue
+
+            vistos[caminho] = assinatura
+
+            with self._lock:
+
+                if caminho in self._pendentes:
+                    continue
+
+                if self.processados.get(caminho) == assinatura:
+                    continue
+
+            if self._vistos.get(caminho) == assinatura:
+                prontos.append(caminho)
+
+        self._vistos = vistos
+
+        return prontos
+
+    def enqueue(self, caminho: str) -> bool:
+        """
+        Coloca na fila, esperando vaga (contrapressão). False se o watcher parou.
+        """
+
+        with self._lock:
+            self._pendentes.add(caminho)
+
+        while not self.parar.is_set():
+
+            try:
+                self.fila.put(caminho, timeout=self.intervalo)
+                return True
+            except queue.Full:
+                continue
+
+        with self._lock:
+            self._pendentes.discard(caminho)
+
+        return False
+
+    # ------------------- Processamento -------------------
+
+    def process_file(self, caminho: str) -> list:
+        """
+        Lê um arquivo, grava na memória histórica e gera de novo os arquivos
+        dos meses gravados. Retorna os caminhos gerados.
+        """
+
+        assinatura = _signature(caminho)
+
+        self._seq += 1
+
+        with open(caminho, "rb") as f:
+
+            info = scan_file(f, os.path.basename(caminho), self._seq)
+
+            df = consolidate(
+                [info],
+                depara_path=self.depara_path,
+                cache=self.cache,
+                compact=self.compact,
+                classificador=self.classificador
+            )
+
+        gerados = []
+
+        if df.empty:
+            self.log(f"sem registros: {caminho}")
+        else:
+
+            resultado = upsert_history(df, self.historico)
+
+            for label in resultado["mantidos"]:
+                self.log(f"histórico: mantido {label:%m/%Y} ({os.path.basename(caminho)} tem período menor)")
+
+            for label in resultado["gravados"]:
+                df_mes = load_history(self.historico, meses=[label], compact=self.compact)
+                gerados.extend(write_outputs(df_mes, self.saida, self.formatos))
+
+        with self._lock:
+            self.processados[caminho] = assinatura
+            self._save_state()
+
+        return gerados
+
+    def _worker(self):
+
+        while True:
+
+            caminho = self.fila.get()
+
+            try:
+
+                if caminho is None:
+                    return
+
+                t0 = time.perf_counter()
+
+                for gerado in self.process_file(caminho):
+                    self.log(f"gerado: {gerado}")
+
+                self.log(f"processado: {caminho} em {time.perf_counter() - t0:.1f} s")
+
+            except Exception as e:
+
+                # não tenta de novo até o arquivo mudar
+                with self._lock:
+                    self.processados[caminho] = _signature(caminho)
+
+                self.log(f"falha ao processar {caminho}: {e}")
+
+            finally:
+
+                with self._lock:
+                    self._pendentes.discard(caminho)
+
+                self.fila.task_done()
+
+    # ------------------- Execução -------------------
+
+    def run(self, max_ciclos: int = None):
+        """
+        Varre a pasta a cada 'intervalo' segundos até stop() (ou max_ciclos varreduras).
+        """
+
+        os.makedirs(self.saida, exist_ok=True)
+
+        worker = threading.Thread(target=self._worker, name="prisma-watch", daemon=True)
+        worker.start()
+
+        ciclos = 0
+
+        try:
+
+            while not self.parar.is_set():
+
+                for caminho in self.poll():
+
+                    if not self.enqueue(caminho):
+                        break
+
+                ciclos += 1
+
+                if max_ciclos is not None and ciclos >= max_ciclos:
+                    break
+
+                self.parar.wait(self.intervalo)
+
+        finally:
+
+            # termina o que já está na fila
+            self.fila.put(None)
+            worker.join()
+
+    def stop(self):
+        self.parar.set()
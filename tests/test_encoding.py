@@ -0,0 +1,85 @@
+# ============================================================
+# tests/test_encoding.py — Mesmo relatório em utf-8, utf-8 com BOM, cp1252 e
+# latin-1: período, Data de extração e registros idênticos aos do texto original
+# Uso: python -m pytest -q tests
+# ============================================================
+
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.bench_encoding import CODIFICACOES, corpus
+from prisma.parser import (
+    process_txt_content,
+    process_txt_file,
+    process_txt_file_chunked,
+    sniff_encoding,
+)
+from prisma.pipeline import scan_file
+
+TEXTOS = corpus(50)
+
+# latin-1 sem bytes indefinidos no cp1252 decodifica igual como cp1252
+DETECTADA = {
+    "utf-8": "utf-8",
+    "utf-8-sig": "utf-8-sig",
+    "cp1252": "cp1252",
+    "latin-1": "cp1252",
+}
+
+
+@pytest.mark.parametrize("codificacao", CODIFICACOES)
+@pytest.mark.parametrize("nome", list(TEXTOS))
+def test_cabecalho(nome, codificacao):
+
+    texto = TEXTOS[nome]
+
+    esperado = scan_file(io.StringIO(texto), "sintetico.txt", 1)
+
+    info = scan_file(io.BytesIO(texto.encode(codificacao)), "sintetico.txt", 1)
+
+    assert info["encoding"] == DETECTADA[codificacao]
+    assert info["period"] and info["period"] == esperado["period"]
+    assert info["extracao"] == esperado["extracao"]
+
+
+@pytest.mark.parametrize("codificacao", CODIFICACOES)
+@pytest.mark.parametrize("nome", list(TEXTOS))
+def test_registros(nome, codificacao):
+
+    texto = TEXTOS[nome]
+
+    dados = texto.encode(codificacao)
+
+    esperado = process_txt_content(texto, "sintetico.txt", 1)
+
+    # codificação informada (como no app) e detectada durante a leitura
+    info = scan_file(io.BytesIO(dados), "sintetico.txt", 1)
+
+    pd.testing.assert_frame_equal(
+        process_txt_file(io.BytesIO(dados), "sintetico.txt", 1, encoding=info["encoding"]),
+        esperado
+    )
+
+    pd.testing.assert_frame_equal(
+        process_txt_file(io.BytesIO(dados), "sintetico.txt", 1),
+        esperado
+    )
+
+
+@pytest.mark.parametrize("codificacao", CODIFICACOES)
+def test_registros_em_blocos(codificacao):
+
+    texto = TEXTOS["acentuado"]
+
+    pd.testing.assert_frame_equal(
+        process_txt_file_chunked(
+            io.BytesIO(texto.encode(codificacao)), "sintetico.txt", 1, workers=2, chunk_lines=200
+        ),
+        process_txt_content(texto, "sintetico.txt", 1)
+    )
+
+
+def test_latin1_com_bytes_indefinidos_no_cp1252():
+    assert sniff_encoding("Período \x81".encode("latin-1")) == "latin-1"
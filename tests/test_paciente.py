@@ -0,0 +1,70 @@
+# ============================================================
+# tests/test_paciente.py — Extrator de busca única das linhas 'Paciente:'
+# (parse_paciente_line) contra a leitura campo a campo, em linhas geradas ao acaso
+# Uso: python -m pytest -q tests
+# ============================================================
+
+import random
+
+import pytest
+
+from prisma.parser import PACIENTE_RE, _parse_paciente_line_generico, parse_paciente_line
+
+# Pedaços de linha com os casos difíceis: marcadores repetidos ou faltando,
+# "Plano" fora do lugar, espaços duplos, aspas, campos vazios
+IDS_NOMES = [
+    "123 - PACIENTE DA SILVA", "00123 - MARIA", "JOSE  SILVA", "45 - ANA Plano", "7 - A - B",
+    "", " ", "9 - ALTA:  X", "8 - NOME  Entrada: 01/01/2025", "3 - JOÃO DA CONCEIÇÃO",
+]
+DATAS = ["01/02/2025", "", " ", "31/12/2024 ", "  Alta: 02/02/2025"]
+CONVENIOS = ["UNIMED", "BRADESCO SAÚDE", "", "PLANO X", "Plano: Y", "AMIL  Alta: 3", 'SUL"AMERICA']
+PLANOS = ["PLANO 1", "", " ", "Plano 2", '"', 'X"', "A  B", "PLANO Plano"]
+MARCADORES = ["  Entrada: ", "  Alta: ", "  Convênio: ", "  Plano: "]
+
+
+def linha_aleatoria(r: random.Random) -> str:
+
+    valores = [r.choice(DATAS), r.choice(DATAS), r.choice(CONVENIOS), r.choice(PLANOS)]
+    marcadores = list(MARCADORES)
+
+    # mutações do layout padrão
+    if r.random() < 0.1:
+        marcadores[r.randrange(4)] = ""
+    if r.random() < 0.1:
+        marcadores[r.randrange(4)] = marcadores[r.randrange(4)]
+    if r.random() < 0.1:
+        i = r.randrange(4)
+        marcadores[i] = marcadores[i].replace("  ", " ", 1)
+
+    campo = r.choice(["", " ", "  "]) + r.choice(IDS_NOMES) + "".join(
+        m + v for m, v in zip(marcadores, valores)
+    ) + r.choice(["", " ", "  "])
+
+    return r.choice([
+        'Paciente:,"{}"',
+        'Paciente:,"{}"',
+        'Paciente:,"{}"',
+        'Paciente:,"{}",,',
+        "Paciente:,{}",
+        'Paciente:,""{}"',
+        'Paciente: ,"{}"',
+    ]).format(campo)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_busca_unica_igual_campo_a_campo(seed):
+
+    r = random.Random(seed)
+
+    busca_unica = 0
+
+    for _ in range(10_000):
+
+        line = linha_aleatoria(r)
+
+        busca_unica += PACIENTE_RE.fullmatch(line) is not None
+
+        assert parse_paciente_line(line) == _parse_paciente_line_generico(line), line
+
+    # os dois caminhos (layout padrão e retorno campo a campo) são exercitados
+    assert 0 < busca_unica < 10_000
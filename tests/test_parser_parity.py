@@ -0,0 +1,401 @@
+# ============================================================
+# tests/test_parser_parity.py — Paridade do parser com a versão original
+# (process_txt_content do app.py de base, congelada abaixo): leitura serial,
+# leitura em blocos paralelos e fuzz de linhas-marcador
+# Uso: python -m pytest -q tests
+# ============================================================
+
+import csv
+import io
+import random
+import re
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from benchmarks.sintetico import gerar_relatorio
+from prisma.parser import process_txt_content, process_txt_file_chunked
+
+# ------------------- Versão original (não alterar) -------------------
+
+
+def parse_number_us(s):
+    if s is None:
+        return None
+    s = str(s).strip().strip('"')
+    if s == "":
+        return None
+    s = s.replace(",", "")
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def extract_between(text, start_label, end_label):
+    p = text.find(start_label)
+    if p == -1:
+        return ""
+    p += len(start_label)
+    q = text.find(end_label, p)
+    return text[p:q].strip() if q != -1 else text[p:].strip()
+
+
+def extract_plano(text):
+    m = re.search(r'Plano\s*:\s*"?([^"]*?)"?$', text.strip())
+    if m and m.group(1):
+        return m.group(1).strip()
+    if "Plano:" in text:
+        return text.split("Plano:")[-1].strip().strip('"')
+    return ""
+
+
+def detect_periodo_first_lines(raw_text: str) -> str:
+    lines = raw_text.splitlines()[:5]
+    header = " ".join(lines)
+
+    m = re.search(
+        r'[",]*Per[ií]odo\s*:[" ,]*([0-3]?\d/[0-1]?\d/\d{4})\s*a\s*([0-3]?\d/[0-1]?\d/\d{4})',
+        header
+    )
+
+    return f"{m.group(1)} a {m.group(2)}" if m else ""
+
+
+def periodo_label_br(periodo_str: str):
+
+    if not isinstance(periodo_str, str) or "a" not in periodo_str:
+        return None
+
+    inicio = periodo_str.split("a")[0].strip()
+
+    try:
+
+        d = pd.to_datetime(inicio, format="%d/%m/%Y", errors="coerce")
+
+        if pd.isna(d):
+            return None
+
+        return datetime(d.year, d.month, 1)
+
+    except Exception:
+        return None
+
+
+def baseline_process_txt_content(txt: str, origem_nome: str = "", upload_seq: int = 0) -> pd.DataFrame:
+
+    raw = txt.replace(",Setor:,", ",")
+    lines_all = raw.splitlines()
+
+    default_periodo = detect_periodo_first_lines(raw)
+
+    current_setor = ""
+    current_periodo = default_periodo
+
+    records = []
+
+    i = 0
+
+    m_data = re.search(r"Data:\s*,?\s*([0-3]?\d/[0-1]?\d/\d{4})", txt)
+    data_extracao = m_data.group(1) if m_data else "DATA_NAO_ENCONTRADA"
+
+    while i < len(lines_all):
+
+        line = lines_all[i]
+
+        if ("AMERICAS MEDICAL CITY" in line) or ("ALCLIMA" in line):
+            i += 1
+            continue
+
+        if "Período" in line or "Período" in ",".join(lines_all[max(0, i-2):i+5]):
+
+            window = ",".join(lines_all[max(0, i-2):min(len(lines_all), i+5)])
+
+            m = re.search(
+                r'[",]*Per[ií]odo\s*:[" ,]*([0-3]?\d/[0-1]?\d/\d{4})\s*a\s*([0-3]?\d/[0-1]?\d/\d{4})',
+                window
+            )
+
+            if m:
+                current_periodo = f"{m.group(1)} a {m.group(2)}"
+            else:
+                current_periodo = default_periodo
+
+        if line.startswith("Setor:"):
+
+            parts = next(csv.reader([line]))
+
+            if len(parts) >= 2:
+                current_setor = parts[1].strip().strip('"')
+
+        if line.startswith("Paciente:"):
+
+            fields = next(csv.reader([line]))
+
+            payload = fields[1].strip().strip('"') if len(fields) >= 2 else ""
+
+            split_marker = "  Entrada: "
+
+            p_ent = payload.find(split_marker)
+
+            id_nome = payload[:p_ent].strip() if p_ent != - \
+                1 else payload.strip()
+
+            entrada = extract_between(payload, "  Entrada: ", "  Alta: ")
+            alta = extract_between(payload, "  Alta: ", "  Convênio: ")
+            convenio = extract_between(payload, "  Convênio: ", "  Plano: ")
+            plano = extract_plano(payload)
+
+            j = i + 1
+
+            while j < len(lines_all):
+
+                l2 = lines_all[j]
+
+                if l2.startswith("Paciente:") or l2.startswith("Setor:"):
+                    break
+
+                if ("AMERICAS MEDICAL CITY" in l2) or ("ALCLIMA" in l2):
+                    j += 1
+                    continue
+
+                if l2.startswith('"Tipo de Produto:"'):
+
+                    prod_fields = next(csv.reader([l2]))
+
+                    tipo_produto = prod_fields[1].strip().strip(
+                        '"') if len(prod_fields) > 1 else ""
+
+                    k = j + 1
+
+                    while k < len(lines_all):
+
+                        l3 = lines_all[k]
+
+                        if ("AMERICAS MEDICAL CITY" in l3) or ("ALCLIMA" in l3):
+                            k += 1
+                            continue
+
+                        if "Total do Tipo de Produto:" in l3:
+
+                            tot_fields = next(csv.reader([l3]))
+
+                            qtd_total = parse_number_us(tot_fields[1]) if len(
+                                tot_fields) > 1 else None
+                            custo_atual = parse_number_us(
+                                tot_fields[2]) if len(tot_fields) > 2 else None
+                            consumo_total = parse_number_us(
+                                tot_fields[3]) if len(tot_fields) > 3 else None
+
+                            periodo_final = current_periodo or default_periodo
+
+                            records.append({
+
+                                "Arquivo Origem": origem_nome,
+                                "Upload Seq": upload_seq,
+                                "Extração Sishop": data_extracao,
+
+                                "Período": periodo_final,
+
+                                "Período Label": periodo_label_br(periodo_final),
+
+                                "Setor": current_setor,
+
+                                "Paciente": id_nome,
+
+                                "Entrada": entrada,
+                                "Alta": alta,
+                                "Convênio": convenio,
+                                "Plano": plano,
+
+                                "Tipo de Produto": tipo_produto,
+
+                                "Qtd. Total": qtd_total,
+                                "Custo Atual": custo_atual,
+                                "Consumo Total": consumo_total
+
+                            })
+
+                            j = k
+                            break
+
+                        if l3.startswith('"Tipo de Produto:"') or l3.startswith("Paciente:") or l3.startswith("Setor:"):
+                            break
+
+                        k += 1
+
+                j += 1
+
+            i = j - 1
+
+        i += 1
+
+    df = pd.DataFrame(records, columns=[
+
+        "Arquivo Origem",
+        "Upload Seq",
+        "Extração Sishop",
+
+        "Período",
+        "Período Label",
+
+        "Setor",
+
+        "Paciente",
+
+        "Entrada",
+        "Alta",
+        "Convênio",
+        "Plano",
+
+        "Tipo de Produto",
+
+        "Qtd. Total",
+        "Custo Atual",
+        "Consumo Total"
+
+    ])
+
+    if not df.empty and "Paciente" in df.columns:
+
+        split_cols = df["Paciente"].str.split(" - ", n=1, expand=True)
+
+        df["Registro"] = split_cols[0]
+        df["Nome do Paciente"] = split_cols[1]
+
+        df.drop(columns=["Paciente"], inplace=True)
+
+        cols = df.columns.tolist()
+
+        pos = cols.index("Registro")
+
+        cols.insert(pos + 1, cols.pop(cols.index("Nome do Paciente")))
+
+        df = df[cols]
+
+    return df
+
+# ------------------- Entradas -------------------
+
+
+def relatorios() -> dict:
+    """
+    Relatórios sintéticos (benchmarks/sintetico.py) e variações de layout
+    que já apareceram em exportações reais.
+    """
+
+    base = gerar_relatorio(n_setores=4, n_pacientes=30, seed=1)
+
+    linhas = gerar_relatorio(n_setores=3, n_pacientes=10, seed=9).splitlines()
+    linhas.insert(40, '"AMERICAS MEDICAL CITY"')
+    linhas.insert(41, 'Total,Setor:,"X"')
+    linhas.insert(60, '"Período: 01/03/2025 a 31/03/2025"')
+
+    return {
+        "padrao": base,
+        "crlf": base.replace("\n", "\r\n"),
+        "dois_meses": gerar_relatorio(mes=1, n_pacientes=10, seed=2) + gerar_relatorio(mes=2, n_pacientes=10, seed=3),
+        "periodo_quebrado": base.replace(
+            '"Período: 01/01/2025 a 28/01/2025",,,', '"Período:"\n"01/01/2025 a 28/01/2025"'
+        ),
+        "periodo_sem_acento": base.replace("Período", "Periodo"),
+        "sem_cabecalho": "\n".join(base.splitlines()[4:]),
+        "setor_embutido": "\n".join(linhas),
+        "vazio": "",
+    }
+
+
+# Linhas-marcador (e vizinhas) combinadas ao acaso
+MARCADORES = [
+    '"AMERICAS MEDICAL CITY"', '"ALCLIMA"',
+    '"Período: 01/02/2025 a 28/02/2025"', '"Período:"', '"01/03/2025 a 31/03/2025"',
+    'Setor:,"A"', 'Setor:,"B"', 'x,Setor:,y',
+    'Paciente:,"1 - X  Entrada: 01/01/2025  Alta:   Convênio: C  Plano: P"',
+    'Paciente:,"2 - Y  Entrada: 02/01/2025  Alta: 03/01/2025  Convênio: D  Plano: "Q""',
+    'Paciente:,"3 - Z  Plano: R  Entrada: 04/01/2025"',
+    '"Tipo de Produto:","MED"', '"Tipo de Produto:","MAT"',
+    '"Total do Tipo de Produto:","1,000.00","2.00","3.00"', '"Total do Tipo de Produto:"',
+    '"item",1,2,3', '', '"Data:",01/04/2025',
+    # Data de extração quebrada em linhas (o \s* da regex original atravessa quebras)
+    'x,,Data:', 'Data:,', ',', ' ', '01/05/2025,,', '"02/06/2025"',
+]
+
+
+# Bloco completo de paciente, para que boa parte das linhas gere registros
+BLOCO_PACIENTE = [
+    'Paciente:,"4 - W  Entrada: 05/01/2025  Alta: 06/01/2025  Convênio: E  Plano: S"',
+    '"Tipo de Produto:","GASES"',
+    '"item",1,2,3',
+    '"Total do Tipo de Produto:","5.00","1.50","7.50"',
+]
+
+
+def texto_fuzz(seed: int) -> str:
+
+    r = random.Random(seed)
+
+    linhas = []
+
+    for _ in range(r.randint(0, 40)):
+
+        if r.random() < 0.3:
+            linhas += BLOCO_PACIENTE
+        else:
+            linhas.append(r.choice(MARCADORES))
+
+    return "\n".join(linhas)
+
+
+def ler_em_blocos(texto: str, chunk_lines: int) -> pd.DataFrame:
+    return process_txt_file_chunked(
+        io.BytesIO(texto.encode("utf-8")), "f.txt", 3, workers=2, chunk_lines=chunk_lines
+    )
+
+# ------------------- Testes -------------------
+
+
+@pytest.mark.parametrize("nome", list(relatorios()))
+def test_serial_igual_ao_original(nome):
+
+    texto = relatorios()[nome]
+
+    pd.testing.assert_frame_equal(
+        process_txt_content(texto, "f.txt", 3),
+        baseline_process_txt_content(texto, "f.txt", 3)
+    )
+
+
+@pytest.mark.parametrize("chunk_lines", [1, 7, 50, 100_000])
+@pytest.mark.parametrize("nome", list(relatorios()))
+def test_blocos_igual_ao_original(nome, chunk_lines):
+
+    texto = relatorios()[nome]
+
+    pd.testing.assert_frame_equal(
+        ler_em_blocos(texto, chunk_lines),
+        baseline_process_txt_content(texto, "f.txt", 3)
+    )
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_fuzz_serial(seed):
+
+    texto = texto_fuzz(seed)
+
+    pd.testing.assert_frame_equal(
+        process_txt_content(texto, "f.txt", 3),
+        baseline_process_txt_content(texto, "f.txt", 3)
+    )
+
+
+@pytest.mark.parametrize("chunk_lines", [1, 5])
+@pytest.mark.parametrize("seed", range(10))
+def test_fuzz_blocos(seed, chunk_lines):
+
+    texto = texto_fuzz(seed)
+
+    pd.testing.assert_frame_equal(
+        ler_em_blocos(texto, chunk_lines),
+        baseline_process_txt_content(texto, "f.txt", 3)
+    )